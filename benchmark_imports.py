@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Measure the cold import time of the budget tracker modules
+
+Each module is imported in a fresh interpreter several times and the median
+wall time is reported, along with the heavy optional libraries the import
+pulled in.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ['storage', 'budget_tracker', 'budget_tracker_web']
+HEAVY_MODULES = ['plotly', 'openai', 'streamlit', 'pyarrow']
+RUNS = 5
+
+# Probes run from the repository so its modules import from any working directory
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ','.join(loaded))
+"""
+
+
+def time_import(module: str) -> tuple:
+    """Return (median seconds, heavy modules loaded) for importing ``module``"""
+    timings = []
+    loaded = ''
+    for _ in range(RUNS):
+        result = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True, cwd=REPO_DIR)
+        elapsed, _, loaded = result.stdout.strip().rpartition('\n')[2].partition(' ')
+        timings.append(float(elapsed))
+    return statistics.median(timings), loaded
+
+
+def main():
+    """Print the import-time table"""
+    print(f"⏱️ Median cold import time over {RUNS} runs\n")
+    print(f"{'Module':<22}{'Seconds':>9}  Heavy libraries loaded")
+    for module in MODULES:
+        seconds, loaded = time_import(module)
+        print(f"{module:<22}{seconds:>9.3f}  {loaded or '-'}")
+
+
+if __name__ == "__main__":
+    main()
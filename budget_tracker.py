@@ -0,0 +1,1532 @@
+"""Core budget tracking logic, usable without Streamlit
+
+``BudgetTracker`` owns storage, categorization, summaries and charts.
+Plotly and the OpenAI client are imported on first use, so CLI and batch
+tools that never draw a chart or call the API don't pay for them. The
+Streamlit app uses the ``BudgetTrackerWeb`` subclass, which reports
+problems in the page instead of on stderr.
+
+Money is handled in whole centavos: new transactions take peso amounts,
+but ledger frames, summaries and overviews hold int64 centavos so sums are
+exact. Stores keep pesos, and charts and AI prompts convert back.
+"""
+
+import functools
+import itertools
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import weakref
+import pandas as pd
+from collections import OrderedDict
+from datetime import datetime, date
+from typing import List, Dict, Optional
+from dotenv import load_dotenv
+from categorizer import (EXPENSE_CATEGORIES, CategorizationQueue, CategoryCache, LocalCategorizer,
+                         PendingCategories, chunk_descriptions, match_category, normalize_description,
+                         parse_category_mapping)
+from importer import IMPORT_BATCH_SIZE, IMPORT_COLUMNS, TransactionFileReader
+from rwlock import ReadWriteLock
+from search_index import DescriptionIndex
+from storage import (TRANSACTION_COLUMNS, ExcelStorage, amount_to_centavos, build_rollup,
+                     compact_transactions, empty_transactions, migrate_excel_ledger, open_storage,
+                     to_centavos, to_pesos, write_excel)
+
+load_dotenv(override=True)
+
+TRANSACTION_TYPES = ('income', 'expense', 'savings')
+
+# Seconds to trust an API key check before hitting the API again
+API_KEY_CHECK_TTL = 15 * 60
+API_KEY_RETRY_AFTER = 60
+
+# Posterior probability above which the local categorizer answers without the LLM
+LOCAL_CATEGORIZER_CONFIDENCE = 0.9
+# Seconds to wait for an LLM categorization before using the local guess
+AI_CATEGORIZE_TIMEOUT = 10
+# Seconds to wait for a batched LLM categorization, and answer tokens allowed per description
+AI_CATEGORIZE_BATCH_TIMEOUT = 30
+AI_CATEGORIZE_ANSWER_TOKENS = 12
+
+# LLM categorization requests allowed in flight from the background queue
+CATEGORIZATION_WORKERS = 2
+
+# Parsed ledgers shared by every tracker in the process, keyed by store path.
+# Each entry holds the storage signature, the data version, the ledger
+# DataFrame and its lazily built monthly rollup, and is dropped on our own
+# writes.
+_ledger_cache: Dict[str, Dict] = {}
+_ledger_cache_lock = threading.Lock()
+# Description search indexes for stores without one of their own, keyed by
+# store path. Each entry holds the index and the store signature it matches;
+# our own writes update the index in place, other changes to the store make
+# the next search rebuild it. Guarded by _ledger_cache_lock.
+_search_indexes: Dict[str, Dict] = {}
+# Held while a stale ledger is re-read, so concurrent readers parse it once
+_ledger_load_lock = threading.Lock()
+# Times a ledger is re-read when other writers keep changing the store during the read
+LEDGER_LOAD_ATTEMPTS = 3
+# Every newly loaded ledger gets the next data version, so any write to the
+# store (ours or another process's) moves the version forward
+_data_versions = itertools.count(1)
+
+# Plotly figures kept per tracker, keyed by (chart, view, data version)
+FIGURE_CACHE_SIZE = 32
+
+
+def _cached_figure(method):
+    """Memoize a chart method per (chart, view, data version, arguments)
+    
+    Only frames handed out by ``load_data`` carry a view and version; charts
+    of any other frame are built every time. Cached figures are shared, so
+    callers must not mutate them.
+    """
+    @functools.wraps(method)
+    def wrapper(self, df: pd.DataFrame, *args, **kwargs):
+        view = self._frame_info(df).get('view')
+        if view is None:
+            return method(self, df, *args, **kwargs)
+        
+        key = (method.__name__, view, args, tuple(sorted(kwargs.items())))
+        with self._figure_lock:
+            if key in self._figure_cache:
+                self._figure_cache.move_to_end(key)
+                return self._figure_cache[key]
+        
+        fig = method(self, df, *args, **kwargs)
+        with self._figure_lock:
+            self._figure_cache[key] = fig
+            while len(self._figure_cache) > FIGURE_CACHE_SIZE:
+                self._figure_cache.popitem(last=False)
+        return fig
+    return wrapper
+
+class BudgetTracker:
+    def __init__(self, excel_file: str = 'budget_data.xlsx', storage_uri: str = 'budget_data.db',
+                 category_cache_file: str = 'category_cache.json'):
+        # Excel is kept as an import/export format; transactions live in ``storage``,
+        # picked by extension: .db (SQLite), .parquet or .csv (.xlsx still works)
+        self.excel_file = excel_file
+        self.storage = open_storage(storage_uri)
+        # One tracker is shared by every Streamlit session: reads of the
+        # cached ledger run concurrently while store writes run one at a time
+        self._ledger_lock = ReadWriteLock()
+        self.user_profile_file = 'user_profile.xlsx'
+        
+        # OpenAI client, created on first use; see client
+        self._client = None
+        self._client_failed = False
+        self._client_lock = threading.Lock()
+        
+        # Cached result of the last API key check (see _validate_api_key)
+        self._api_key_status = None
+        
+        # id(frame) -> (weakref to frame, {'cube': ..., 'view': ...}); see _frame_info
+        self._frame_memo = {}
+        self._frame_memo_lock = threading.Lock()
+        # LRU of chart figures; see _cached_figure
+        self._figure_cache = OrderedDict()
+        self._figure_lock = threading.Lock()
+        
+        self._ensure_database_integrity()
+        
+        # Expenses stored with a guessed category until the LLM confirms one
+        self.pending_categories = PendingCategories(self.storage.path + '.pending')
+        self.category_cache = CategoryCache(category_cache_file)
+        self._local_categorizer = None
+        self._categorization_queue = None
+        if not self.category_cache.exists():
+            self._seed_category_cache()
+    
+    @property
+    def client(self):
+        """OpenAI client, or None if no API key is set or the client can't be created
+        
+        openai is imported and the client built on first use, so tools that
+        never call the API don't pay for either.
+        """
+        with self._client_lock:
+            if self._client is None and not self._client_failed:
+                api_key = os.getenv('OPENAI_API_KEY')
+                if not api_key:
+                    return None
+                try:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=api_key)
+                except Exception as e:
+                    self._client_failed = True
+                    self._warn(f"OpenAI client initialization failed: {str(e)[:50]}...")
+            return self._client
+    
+    def _warn(self, message: str):
+        """Report a recoverable problem to the user"""
+        print(message, file=sys.stderr)
+    
+    def _error(self, message: str):
+        """Report a failed operation to the user"""
+        print(message, file=sys.stderr)
+    
+    def _seed_category_cache(self):
+        """Fill a new category cache from expenses already categorized in the store"""
+        self.category_cache.update(self._categorized_expenses(), save=False)
+        self.category_cache.save()
+    
+    def _categorized_expenses(self) -> List[tuple]:
+        """Return (description, category) pairs of stored expenses with a confirmed category, oldest first"""
+        df = self.load_data()
+        if df.empty:
+            return []
+        expenses = df[(df['type'] == 'expense') & df['category'].isin(EXPENSE_CATEGORIES) &
+                      (df['category'] != 'Other') & ~df['id'].isin(self.pending_categories.ids())]
+        return list(zip(expenses['description'], expenses['category']))
+    
+    @property
+    def local_categorizer(self) -> LocalCategorizer:
+        """Offline categorizer, trained from the store on first use"""
+        if self._local_categorizer is None:
+            model = LocalCategorizer()
+            model.learn_many(self._categorized_expenses())
+            self._local_categorizer = model
+        return self._local_categorizer
+    
+    def _learn_categories(self, pairs: List[tuple]):
+        """Feed confirmed (description, category) pairs to the cache and local model"""
+        pairs = [(description, category) for description, category in pairs
+                 if match_category(category) not in (None, 'Other')]
+        if not pairs:
+            return
+        self.category_cache.update(pairs)
+        if self._local_categorizer is not None:
+            self._local_categorizer.learn_many(pairs)
+        
+    def _ensure_database_integrity(self):
+        """Ensure database files exist and have proper structure"""
+        # Create the transaction store, migrating a legacy Excel ledger once
+        if not self.storage.exists():
+            self._create_transaction_store()
+        
+        # Create user profile file if it doesn't exist
+        if not os.path.exists(self.user_profile_file):
+            self._create_empty_user_profile()
+        
+        # Validate and repair data integrity
+        self._validate_data_integrity()
+    
+    def _create_transaction_store(self):
+        """Create the transaction store, importing the legacy Excel file if present"""
+        legacy_excel = (not isinstance(self.storage, ExcelStorage) and
+                        os.path.exists(self.excel_file))
+        if legacy_excel:
+            try:
+                migrate_excel_ledger(self.excel_file, self.storage.path)
+                # Reopen so the backend sees the store the migration created
+                # (SQLite only enables search for a database that exists)
+                self.storage = open_storage(self.storage.path)
+                return
+            except Exception as e:
+                self._warn(f"Could not migrate {self.excel_file}: {str(e)}")
+        self.storage.create()
+    
+    def _create_empty_user_profile(self):
+        """Create empty user profile Excel file"""
+        profile_data = {
+            'setting': ['monthly_income', 'savings_goal', 'expense_limit', 'setup_completed', 'created_date'],
+            'value': [0, 0, 0, False, datetime.now().strftime('%Y-%m-%d')]
+        }
+        df = pd.DataFrame(profile_data)
+        df.to_excel(self.user_profile_file, index=False, sheet_name='UserProfile')
+    
+    def _validate_data_integrity(self):
+        """Validate the ledger, repairing only the rows that need it
+        
+        A clean pass records the store's signature in ``integrity_file``,
+        and later starts skip the check while the signature is unchanged.
+        """
+        try:
+            signature = list(self.storage.signature())
+            if self._read_integrity_signature() == signature:
+                return
+            
+            df = self._load_ledger()
+            if not df.empty:
+                self._repair_rows(df)
+            self._write_integrity_signature(list(self.storage.signature()))
+        except Exception as e:
+            self._warn(f"Data integrity check warning: {str(e)}")
+    
+    def _repair_rows(self, df: pd.DataFrame) -> int:
+        """Fix invalid types, amounts, dates and IDs in the store; return the number of rows fixed"""
+        types = df['type'].astype(str).str.strip().str.lower()
+        valid_types = types.where(types.isin(TRANSACTION_TYPES), 'expense')
+        amounts = pd.to_numeric(df['amount'], errors='coerce')
+        dates = pd.to_datetime(df['date'], errors='coerce')
+        ids = pd.to_numeric(df['id'], errors='coerce')
+        
+        bad_rows = (valid_types != df['type'].astype(object)) | amounts.isna() | dates.isna()
+        bad_ids = ids.isna() | ids.duplicated(keep='first')
+        if not bad_rows.any() and not bad_ids.any():
+            return 0
+        
+        fixed = df.copy()
+        fixed['type'] = valid_types
+        fixed['amount'] = amounts.fillna(0)
+        fixed['date'] = dates.fillna(pd.Timestamp.now().normalize())
+        fixed = self._storage_frame(fixed)
+        with self._ledger_lock.write():
+            try:
+                if bad_ids.any():
+                    # Duplicate or missing IDs can't be addressed row by row; renumber
+                    # just those rows past the highest ID and rewrite the store once
+                    next_id = int(ids.max()) + 1 if ids.notna().any() else 1
+                    fixed.loc[bad_ids, 'id'] = list(range(next_id, next_id + int(bad_ids.sum())))
+                    fixed['id'] = fixed['id'].astype(int)
+                    self.storage.replace_all(fixed)
+                else:
+                    self.storage.update_rows(fixed[bad_rows].to_dict('records'))
+            finally:
+                self._invalidate_cache()
+        return int((bad_rows | bad_ids).sum())
+    
+    @property
+    def integrity_file(self) -> str:
+        """Path recording the store signature of the last clean integrity check"""
+        return self.storage.path + '.integrity'
+    
+    def _read_integrity_signature(self) -> Optional[list]:
+        try:
+            with open(self.integrity_file, encoding='utf-8') as integrity:
+                return json.load(integrity).get('signature')
+        except (OSError, ValueError):
+            return None
+    
+    def _write_integrity_signature(self, signature: list):
+        handle, temp_path = tempfile.mkstemp(prefix='.integrity.', suffix='.tmp',
+                                             dir=os.path.dirname(os.path.abspath(self.integrity_file)))
+        with os.fdopen(handle, 'w', encoding='utf-8') as integrity:
+            json.dump({'signature': signature, 'checked_at': datetime.now().isoformat()}, integrity)
+        os.replace(temp_path, self.integrity_file)
+    
+    def load_data(self, date_filter: str = None, start_date: date = None,
+                  end_date: date = None) -> pd.DataFrame:
+        """Load data from the transaction store with optional date filtering
+        
+        ``date_filter`` selects a named period ('current_month' or
+        'current_year'); ``start_date``/``end_date`` select an inclusive
+        range. Rows come back sorted by date.
+        """
+        try:
+            entry = self._cached_entry()
+            df = entry['ledger']
+            start, end = self._view_bounds(date_filter, start_date, end_date)
+            # Hand out a copy so callers cannot mutate the shared cached frame
+            if start is not None or end is not None:
+                result = self.slice_dates(df, start, end).copy()
+            else:
+                result = df.copy()
+            
+            info = self._frame_info(result, create=True)
+            info['view'] = (entry['version'], start, end)
+            # Whole-month views take their summary cube from the monthly rollup
+            # instead of aggregating raw rows
+            cube = self._rollup_cube(entry, start, end)
+            if cube is not None:
+                info['cube'] = cube
+            return result
+        except Exception as e:
+            self._error(f"Error loading data: {str(e)}")
+            return empty_transactions()
+    
+    def query_transactions(self, transaction_type: str = None, category: str = None,
+                           date_filter: str = None, start_date: date = None, end_date: date = None,
+                           search: str = None, page: int = 1, page_size: int = 50,
+                           sort_by: str = 'date', descending: bool = True) -> Dict:
+        """Return one page of the transactions matching the filters
+        
+        Filters mirror load_data plus an exact ``transaction_type`` and
+        ``category`` and a description ``search`` (see
+        search_transaction_ids). Only the requested page is copied out of the cached
+        ledger, so callers can format it without touching the other rows.
+        Returns a dict with 'rows' (the page), 'total_rows', 'page',
+        'page_count' and 'totals' (centavos per type over all matching rows).
+        """
+        if sort_by not in TRANSACTION_COLUMNS:
+            raise ValueError(f"Cannot sort by '{sort_by}'")
+        if page_size < 1:
+            raise ValueError("Page size must be at least 1")
+        
+        rows = self.slice_dates(self._load_ledger(), *self._view_bounds(date_filter, start_date, end_date))
+        mask = None
+        if transaction_type:
+            mask = rows['type'] == transaction_type
+        if category:
+            category_mask = rows['category'] == category
+            mask = category_mask if mask is None else mask & category_mask
+        if search and search.strip():
+            search_mask = rows['id'].isin(self.search_transaction_ids(search))
+            mask = search_mask if mask is None else mask & search_mask
+        if mask is not None:
+            rows = rows[mask]
+        
+        total_rows = len(rows)
+        page_count = max(1, -(-total_rows // page_size))
+        page = min(max(1, page), page_count)
+        
+        if sort_by == 'date':
+            # The ledger is already in (date, id) order
+            ordered = rows.iloc[::-1] if descending else rows
+        else:
+            ordered = rows.sort_values([sort_by, 'date', 'id'], ascending=not descending,
+                                       kind='mergesort', na_position='last')
+        
+        return {
+            'rows': ordered.iloc[(page - 1) * page_size:page * page_size].copy(),
+            'total_rows': total_rows,
+            'page': page,
+            'page_count': page_count,
+            'totals': {transaction_type: int(total) for transaction_type, total
+                       in rows.groupby('type', observed=True)['amount'].sum().items()}
+        }
+    
+    @classmethod
+    def _view_bounds(cls, date_filter: str = None, start_date: date = None,
+                     end_date: date = None) -> tuple:
+        """Combine a named period and an inclusive date range into [start, end) timestamps"""
+        start, end = cls.get_period_bounds(date_filter)
+        if start_date is not None:
+            start = max(start, pd.Timestamp(start_date)) if start is not None else pd.Timestamp(start_date)
+        if end_date is not None:
+            range_end = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+            end = min(end, range_end) if end is not None else range_end
+        return start, end
+    
+    @staticmethod
+    def get_period_bounds(view_type: str = None) -> tuple:
+        """Return the [start, end) timestamps of a named view, or (None, None) for all time"""
+        now = datetime.now()
+        if view_type == 'current_month':
+            start = pd.Timestamp(now.year, now.month, 1)
+            return start, start + pd.offsets.MonthBegin(1)
+        if view_type == 'current_year':
+            return pd.Timestamp(now.year, 1, 1), pd.Timestamp(now.year + 1, 1, 1)
+        return None, None
+    
+    @staticmethod
+    def slice_dates(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+        """Return rows with start <= date < end by binary search on the sorted dates"""
+        if df.empty or (start is None and end is None):
+            return df
+        if not df['date'].is_monotonic_increasing:
+            df = df.sort_values('date', kind='mergesort')
+        dates = df['date']
+        lower = dates.searchsorted(pd.Timestamp(start), side='left') if start is not None else 0
+        upper = dates.searchsorted(pd.Timestamp(end), side='left') if end is not None else len(df)
+        if lower == 0 and upper == len(df):
+            return df
+        return df.iloc[lower:upper]
+    
+    def _load_ledger(self) -> pd.DataFrame:
+        """Return the full ledger, parsing the store only when it has changed"""
+        return self._cached_entry()['ledger']
+    
+    def _cached_entry(self) -> Dict:
+        """Return the process-wide cache entry for the store, reloading it if stale"""
+        with self._ledger_lock.read():
+            cache_key = os.path.abspath(self.storage.path)
+            cached = self._fresh_entry(cache_key)
+            if cached is not None:
+                return cached
+            with _ledger_load_lock:
+                # Another reader may have reloaded it while we waited
+                cached = self._fresh_entry(cache_key)
+                if cached is not None:
+                    return cached
+                return self._reload_entry(cache_key)
+    
+    def _fresh_entry(self, cache_key: str) -> Optional[Dict]:
+        """Return the cached entry for the store if it is still current"""
+        signature = self.storage.signature()
+        with _ledger_cache_lock:
+            cached = _ledger_cache.get(cache_key)
+        if cached is not None and cached['signature'] == signature:
+            return cached
+        return None
+    
+    def _reload_entry(self, cache_key: str) -> Dict:
+        """Parse the store into a new cache entry
+        
+        The entry is keyed on the signature read before the load, and only
+        if the store still has it afterwards; otherwise another writer got in
+        during the read and we read again. A ledger that never settles is
+        returned with no signature, so the next call reloads it.
+        """
+        # Fold a long write journal in first so the read itself changes nothing
+        self.storage.compact_if_due()
+        for _ in range(LEDGER_LOAD_ATTEMPTS):
+            signature = self.storage.signature()
+            df = self.storage.load()
+            if self.storage.signature() == signature:
+                break
+        else:
+            signature = None
+        # Categorical type/category and int32 IDs keep the shared frame small
+        # and make the type masks and groupbys integer-code operations
+        df = compact_transactions(df)
+        # Keep rows in date order so period views are binary-search slices
+        # instead of full scans
+        if len(df) > 0:
+            df = df.sort_values(['date', 'id'], kind='mergesort').reset_index(drop=True)
+        entry = {'signature': signature, 'version': next(_data_versions), 'ledger': df,
+                 'rollup': None}
+        with _ledger_cache_lock:
+            _ledger_cache[cache_key] = entry
+        return entry
+    
+    def _load_rollup(self, entry: Dict) -> pd.DataFrame:
+        """Return the monthly rollup that matches the ledger of cache ``entry``"""
+        if entry['rollup'] is None:
+            # SQLite keeps the rollup up to date on every write; other stores
+            # aggregate the ledger once per cached version
+            rollup = None
+            if self.storage.has_rollup:
+                rollup = self.storage.monthly_rollup()
+                # A write since the ledger was read would make the two disagree
+                if self.storage.signature() != entry['signature']:
+                    rollup = None
+            if rollup is None:
+                rollup = build_rollup(entry['ledger'])
+            entry['rollup'] = self._with_year_month(rollup)
+        return entry['rollup']
+    
+    def search_transaction_ids(self, query: str) -> set:
+        """Return IDs of transactions whose description matches every query word as a prefix"""
+        if self.storage.has_search:
+            # SQLite keeps an FTS5 index up to date on every write
+            return set(self.storage.search(query))
+        indexed = self._current_search_index()
+        if indexed is not None:
+            index = indexed['index']
+        else:
+            entry = self._cached_entry()
+            index = DescriptionIndex()
+            ledger = entry['ledger']
+            index.add_many(zip(ledger['id'], ledger['description'].fillna('')))
+            with _ledger_cache_lock:
+                _search_indexes[os.path.abspath(self.storage.path)] = {
+                    'signature': entry['signature'], 'index': index}
+        return index.search(query)
+    
+    def _current_search_index(self) -> Optional[Dict]:
+        """Return the in-memory search index entry if it matches the store as it is now"""
+        if self.storage.has_search:
+            return None
+        cache_key = os.path.abspath(self.storage.path)
+        signature = self.storage.signature()
+        with _ledger_cache_lock:
+            cached = _search_indexes.get(cache_key)
+            if cached is None or cached['signature'] != signature:
+                _search_indexes.pop(cache_key, None)
+                return None
+            return cached
+    
+    def _after_own_write(self, indexed: Optional[Dict]) -> Optional[Dict]:
+        """Carry a search index entry past the store write this tracker just made
+        
+        Returns the entry stamped with the signature the store had right
+        after the write, or None if the store changed since the entry's
+        signature (another writer got in) or the backend can't tell (see
+        StorageBackend.last_write).
+        """
+        last_write = self.storage.last_write
+        if indexed is None or last_write is None or last_write[0] != indexed['signature']:
+            return None
+        return {'signature': last_write[1], 'index': indexed['index']}
+    
+    def _update_search_index(self, indexed: Optional[Dict], added=(), removed=()):
+        """Apply our own write to the index of ``indexed`` and keep it as current
+        
+        ``indexed`` is what _current_search_index returned before the write,
+        carried past each write by _after_own_write; if it is None the index
+        is dropped and the next search rebuilds it. ``added`` holds (ID,
+        description) pairs and ``removed`` IDs. Call with the write lock held.
+        """
+        cache_key = os.path.abspath(self.storage.path)
+        if indexed is None:
+            with _ledger_cache_lock:
+                _search_indexes.pop(cache_key, None)
+            return
+        index = indexed['index']
+        for transaction_id in removed:
+            index.remove(transaction_id)
+        index.add_many(added)
+        with _ledger_cache_lock:
+            _search_indexes[cache_key] = indexed
+    
+    def _rollup_cube(self, entry: Dict, start, end) -> Optional[pd.DataFrame]:
+        """Return the summary cube of a month-aligned [start, end) range from ``entry``'s rollup"""
+        def month_aligned(bound):
+            return bound is None or (bound == bound.normalize() and bound.day == 1)
+        
+        if not (month_aligned(start) and month_aligned(end)):
+            return None
+        cube = self._load_rollup(entry)
+        if start is not None:
+            cube = cube[cube['period'] >= start.year * 100 + start.month]
+        if end is not None:
+            cube = cube[cube['period'] < end.year * 100 + end.month]
+        return cube
+    
+    @property
+    def data_version(self) -> int:
+        """Counter that moves forward whenever the stored ledger changes"""
+        return self._cached_entry()['version']
+    
+    def _invalidate_cache(self):
+        """Drop the cached ledger after this tracker writes to the store"""
+        with _ledger_cache_lock:
+            _ledger_cache.pop(os.path.abspath(self.storage.path), None)
+    
+    def save_data(self, df: pd.DataFrame):
+        """Replace the whole ledger in the transaction store with a centavo ledger frame"""
+        with self._ledger_lock.write():
+            try:
+                self.storage.replace_all(self._storage_frame(df))
+            except Exception as e:
+                self._error(f"Error saving data: {str(e)}")
+            finally:
+                self._invalidate_cache()
+    
+    def export_excel(self, path: str = None) -> str:
+        """Export the full ledger to a formatted Excel workbook and return its path"""
+        path = path or self.excel_file
+        write_excel(self._storage_frame(self.load_data()), path)
+        return path
+    
+    @staticmethod
+    def _storage_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Return a copy of a ledger frame with amounts in pesos, as stores and exports keep them"""
+        df = df.copy()
+        df['amount'] = to_pesos(df['amount'].astype(float))
+        return df
+    
+    def add_transaction(self, transaction_type: str, amount: float, description: str, 
+                       category: str = None, date_input: date = None) -> int:
+        """Add a new transaction of ``amount`` pesos and return its ID"""
+        return self.add_transactions([{
+            'type': transaction_type,
+            'amount': amount,
+            'description': description,
+            'category': category,
+            'date': date_input
+        }])[0]
+    
+    def add_transactions(self, records: List[Dict], categorize_in_background: bool = True) -> List[int]:
+        """Validate, categorize and store a batch of transactions in one write
+        
+        Each record needs 'type', 'amount' (in pesos) and 'description';
+        'category' and 'date' are optional. Raises ValueError (storing nothing) if any record
+        is invalid. Returns the new transaction IDs in input order.
+        
+        Uncategorized expenses the cache and local model can't settle are
+        stored with a provisional category and categorized by the LLM in the
+        background, unless ``categorize_in_background`` is False.
+        """
+        transactions, errors = self._normalize_transactions(records)
+        if errors:
+            raise ValueError(self._summarize_errors([f"Row {position + 1}: {message}"
+                                                     for position, message in errors]))
+        return self._store_transactions(transactions, categorize_in_background)
+    
+    @staticmethod
+    def _summarize_errors(errors: List[str]) -> str:
+        """Join the first few row errors into one message"""
+        return "; ".join(errors[:5]) + (f" (and {len(errors) - 5} more)" if len(errors) > 5 else "")
+    
+    def _store_transactions(self, transactions: List[Dict], categorize_in_background: bool = True) -> List[int]:
+        """Categorize and store already normalized transactions in one write"""
+        # Learn from categories chosen by the user so recurring expenses skip the AI
+        self._learn_categories([(t['description'], t['category']) for t in transactions
+                                if t['type'] == 'expense' and t['category']])
+        
+        uncategorized = [t for t in transactions if t['type'] == 'expense' and not t['category']]
+        provisional, needs_llm = [], []
+        if uncategorized and categorize_in_background:
+            # Store right away with the offline answer (or a provisional guess)
+            # and let the background queue ask the LLM for the rest
+            for index, transaction in enumerate(transactions):
+                if transaction['type'] != 'expense' or transaction['category']:
+                    continue
+                category, fallback = self._categorize_offline(transaction['description'])
+                transaction['category'] = category or fallback
+                if category is None:
+                    provisional.append(index)
+                    if self._llm_available():
+                        needs_llm.append(index)
+        elif uncategorized:
+            # Categorize each distinct uncategorized expense description once
+            categories = self.ai_categorize_expenses([t['description'] for t in uncategorized])
+            for transaction in uncategorized:
+                transaction['category'] = categories.get(transaction['description'], 'Other')
+        
+        with self._ledger_lock.write():
+            indexed = self._current_search_index()
+            try:
+                new_ids = self.storage.insert_many([dict(transaction, amount=to_pesos(transaction['amount']))
+                                                    for transaction in transactions])
+                indexed = self._after_own_write(indexed)
+            finally:
+                self._invalidate_cache()
+            self._update_search_index(indexed, added=zip(new_ids, [t['description'] for t in transactions]))
+        
+        if provisional:
+            self.pending_categories.add_many(new_ids[index] for index in provisional)
+        if needs_llm:
+            self.categorization_queue.submit_many([(new_ids[index], transactions[index]['description'])
+                                                   for index in needs_llm])
+        return new_ids
+    
+    def import_file(self, source, filename: str, mode: str = 'skip_duplicates',
+                    batch_size: int = IMPORT_BATCH_SIZE, progress=None) -> Dict:
+        """Stream transactions from an .xlsx, .xls or .csv file into the store
+        
+        Rows are read, validated and stored ``batch_size`` at a time and
+        merged into the existing ledger. ``mode`` is 'append' (store every
+        valid row), 'skip_duplicates' (skip rows with the same type, date,
+        amount and description as a stored transaction or an earlier row)
+        or 'upsert' (like 'skip_duplicates', but a duplicate's category is
+        replaced by that of the file's last matching row once every batch is
+        stored). Invalid rows are skipped and reported, numbered as in the
+        file.
+        ``progress(rows_read, total_rows)`` is called after every batch;
+        total_rows is None when the file format doesn't record it.
+        
+        Raises ValueError if the file lacks a required column. Returns counts
+        of 'imported', 'updated', 'duplicates' and 'invalid' rows, and the
+        first few row errors under 'errors'.
+        """
+        if mode not in ('append', 'skip_duplicates', 'upsert'):
+            raise ValueError(f"Unknown import mode '{mode}'")
+        reader = TransactionFileReader(source, filename)
+        missing_columns = reader.missing_columns()
+        if missing_columns:
+            raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
+        
+        # Key -> [ID, category] of every stored transaction, extended as batches are stored
+        known = {}
+        if mode != 'append':
+            ledger = self._load_ledger()
+            known = {key: [transaction_id, category] for key, transaction_id, category
+                     in zip(self._duplicate_keys(ledger), ledger['id'], ledger['category'])}
+        # Stored transaction ID -> (its category before the import, last matching row)
+        upserts = {}
+        
+        summary = {'imported': 0, 'updated': 0, 'duplicates': 0, 'invalid': 0, 'errors': []}
+        rows_read = 0
+        for batch in reader.batches(batch_size):
+            row_numbers = [row_number for row_number, _ in batch]
+            transactions, errors = self._normalize_transactions(
+                [{column: record.get(column) for column in IMPORT_COLUMNS} for _, record in batch])
+            summary['invalid'] += len(errors)
+            summary['errors'].extend(f"Row {row_numbers[position]}: {message}" for position, message in errors)
+            rows_read += len(batch)
+            
+            new_transactions, new_keys = transactions, []
+            if mode != 'append' and transactions:
+                new_transactions = []
+                for key, transaction in zip(self._duplicate_keys(pd.DataFrame(transactions)), transactions):
+                    match = known.get(key)
+                    if match is None:
+                        # Reserve the key so later rows of the file count as duplicates
+                        known[key] = [None, transaction['category'], transaction]
+                        new_transactions.append(transaction)
+                        new_keys.append(key)
+                        continue
+                    summary['duplicates'] += 1
+                    if mode == 'upsert' and transaction['category']:
+                        if match[0] is None:
+                            # Still waiting to be stored with this batch
+                            match[2]['category'] = transaction['category']
+                        else:
+                            # The file's last row for a stored transaction wins
+                            upserts[match[0]] = (match[1], transaction)
+            
+            if new_transactions:
+                new_ids = self._store_transactions(new_transactions)
+                summary['imported'] += len(new_ids)
+                for key, transaction_id in zip(new_keys, new_ids):
+                    known[key] = [transaction_id, known[key][2]['category']]
+            if progress is not None:
+                progress(rows_read, reader.total_rows)
+        
+        updates = [(transaction_id, transaction) for transaction_id, (category, transaction) in upserts.items()
+                   if transaction['category'] != category]
+        if updates:
+            summary['updated'] = self._update_categories(updates)
+        summary['errors'] = summary['errors'][:5]
+        return summary
+    
+    @staticmethod
+    def _duplicate_keys(df: pd.DataFrame) -> List[tuple]:
+        """Return the (type, day, amount, description) keys used to spot re-imported rows"""
+        if df.empty:
+            return []
+        descriptions = df['description'].fillna('').astype(str).str.lower().str.split().str.join(' ')
+        return list(zip(df['type'], pd.to_datetime(df['date']).dt.normalize(),
+                        df['amount'], descriptions))
+    
+    def _update_categories(self, updates: List[tuple]) -> int:
+        """Apply (transaction ID, transaction) category upserts and return how many changed"""
+        updated = 0
+        with self._ledger_lock.write():
+            indexed = self._current_search_index()
+            try:
+                for transaction_id, transaction in updates:
+                    if self.storage.update_category(transaction_id, transaction['category']):
+                        updated += 1
+                        indexed = self._after_own_write(indexed)
+            finally:
+                self._invalidate_cache()
+            # Descriptions are unchanged, so only the signature moves on
+            self._update_search_index(indexed)
+        self.pending_categories.discard_many(transaction_id for transaction_id, _ in updates)
+        self._learn_categories([(t['description'], t['category']) for _, t in updates
+                                if t['type'] == 'expense'])
+        return updated
+    
+    @staticmethod
+    def _normalize_transactions(records: List[Dict]) -> tuple:
+        """Validate raw transaction records and coerce them to ledger types (centavo amounts)
+        
+        Each column is coerced for the whole batch at once. Returns the valid
+        transactions, in input order, and a (position in ``records``,
+        message) pair for every invalid record.
+        """
+        if not records:
+            return [], []
+        raw = pd.DataFrame.from_records(records, columns=IMPORT_COLUMNS)
+        
+        types = raw['type'].astype(str).str.strip().str.lower()
+        bad_type = ~types.isin(TRANSACTION_TYPES)
+        
+        amounts = pd.to_numeric(raw['amount'], errors='coerce')
+        bad_amount = amounts.isna() | (amounts.abs() == float('inf'))
+        centavos = to_centavos(amounts.mask(bad_amount, 0))
+        
+        descriptions = raw['description'].where(raw['description'].notna(), '').astype(str).str.strip()
+        
+        categories = raw['category'].where(raw['category'].notna(), '').astype(str).str.strip()
+        categories = categories.astype(object).where(categories != '', None)
+        categories = categories.mask(types == 'income', 'Income')
+        
+        blank_date = raw['date'].isna() | raw['date'].eq('')
+        dates = pd.to_datetime(raw['date'].mask(blank_date), format='mixed', errors='coerce')
+        dates = dates.mask(blank_date, pd.Timestamp.now().normalize())
+        bad_date = dates.isna()
+        
+        errors = []
+        for position in raw.index[bad_type | bad_amount | bad_date]:
+            record = records[position]
+            if bad_type[position]:
+                errors.append((position, f"invalid type '{record.get('type')}'"))
+            elif bad_amount[position]:
+                errors.append((position, f"invalid amount '{record.get('amount')}'"))
+            else:
+                errors.append((position, f"invalid date '{record.get('date')}'"))
+        
+        valid = ~(bad_type | bad_amount | bad_date)
+        transactions = [
+            {'type': transaction_type, 'amount': int(amount), 'description': description,
+             'category': category, 'date': transaction_date}
+            for transaction_type, amount, description, category, transaction_date in zip(
+                types[valid].tolist(), centavos[valid].tolist(), descriptions[valid].tolist(),
+                categories[valid].tolist(), dates[valid].tolist())
+        ]
+        return transactions, errors
+    
+    def delete_transaction(self, transaction_id: int):
+        """Delete a transaction by ID"""
+        with self._ledger_lock.write():
+            indexed = self._current_search_index()
+            try:
+                deleted = self.storage.delete(transaction_id)
+                if deleted:
+                    indexed = self._after_own_write(indexed)
+            finally:
+                self._invalidate_cache()
+            self._update_search_index(indexed, removed=[transaction_id])
+        self.pending_categories.discard_many([transaction_id])
+        if not deleted:
+            raise ValueError(f"Transaction with ID {transaction_id} not found")
+    
+    def get_transaction_by_id(self, transaction_id: int) -> Optional[pd.Series]:
+        """Get a specific transaction by ID, with its amount in centavos"""
+        row = self.storage.get(transaction_id)
+        if row is None:
+            return None
+        row = row.copy()
+        row['amount'] = amount_to_centavos(row['amount'])
+        return row
+    
+    def _validate_api_key(self, force_refresh: bool = False) -> tuple[bool, str]:
+        """Validate OpenAI API key and return status with message
+        
+        The result of the network check is cached for API_KEY_CHECK_TTL
+        seconds (API_KEY_RETRY_AFTER for failures) per key, so AI calls and
+        sidebar renders don't each pay for an extra round trip.
+        """
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            return False, "No API key found in environment variables"
+        
+        if not api_key.startswith(('sk-', 'sk-proj-')):
+            return False, "Invalid API key format"
+        
+        if self.client is None:
+            return False, "OpenAI client is not initialized"
+        
+        cached = self._api_key_status
+        if cached and not force_refresh and cached['key'] == api_key:
+            ttl = API_KEY_CHECK_TTL if cached['is_valid'] else API_KEY_RETRY_AFTER
+            if time.monotonic() - cached['checked_at'] < ttl:
+                return cached['is_valid'], cached['message']
+        
+        try:
+            # Listing a single model checks the key without spending tokens
+            self.client.models.retrieve("gpt-3.5-turbo")
+            is_valid, message = True, "API key is valid"
+        except Exception as e:
+            error_str = str(e)
+            is_valid = False
+            if "401" in error_str or "invalid_api_key" in error_str:
+                message = "Invalid API key - please check your key at https://platform.openai.com/api-keys"
+            elif "insufficient_quota" in error_str:
+                message = "API quota exceeded - check your OpenAI billing"
+            elif "rate_limit" in error_str:
+                message = "Rate limit exceeded - please try again later"
+            else:
+                message = f"API connection error: {error_str[:100]}"
+        
+        self._set_api_key_status(is_valid, message)
+        return is_valid, message
+    
+    def _set_api_key_status(self, is_valid: bool, message: str):
+        """Record the latest API key check result"""
+        self._api_key_status = {
+            'key': os.getenv('OPENAI_API_KEY'),
+            'is_valid': is_valid,
+            'message': message,
+            'checked_at': time.monotonic()
+        }
+    
+    @property
+    def api_key_status(self) -> Optional[tuple]:
+        """Last API key check as (is_valid, message), or None if the current key is unchecked
+        
+        Reads the cached result only and never calls the API; AI requests
+        fill it in through _validate_api_key.
+        """
+        cached = self._api_key_status
+        if not cached or cached['key'] != os.getenv('OPENAI_API_KEY'):
+            return None
+        return cached['is_valid'], cached['message']
+    
+    def _record_api_error(self, error_str: str):
+        """Invalidate the cached API key status after an auth or billing error"""
+        if "401" in error_str or "invalid_api_key" in error_str:
+            self._set_api_key_status(False, "Invalid API key - please check your key at https://platform.openai.com/api-keys")
+        elif "insufficient_quota" in error_str:
+            self._set_api_key_status(False, "API quota exceeded - check your OpenAI billing")
+    
+    def _categorize_offline(self, description: str) -> tuple:
+        """Return (category or None, fallback) using only the cache and local model
+        
+        The category is set when the cache knows the description or the local
+        model is confident; the fallback is the local model's best guess.
+        """
+        cached = self.category_cache.get(description)
+        if cached:
+            return cached, cached
+        
+        local_category, confidence = self.local_categorizer.predict(description)
+        if local_category and confidence >= LOCAL_CATEGORIZER_CONFIDENCE:
+            return local_category, local_category
+        return None, local_category or "Other"
+    
+    def _llm_available(self) -> bool:
+        """Return True if an LLM categorization could be attempted"""
+        return bool(os.getenv('OPENAI_API_KEY')) and self.client is not None
+    
+    def _llm_categorize_many(self, descriptions: List[str]) -> Dict[str, str]:
+        """Ask the LLM to categorize many descriptions in one request
+        
+        The descriptions are numbered and the model answers with a JSON
+        object of number -> category; answers outside EXPENSE_CATEGORIES are
+        dropped. Returns description -> category for the descriptions it
+        settled. Callers keep batches within the token budget (see
+        chunk_descriptions). Raises on API errors, never touches the UI.
+        """
+        is_valid, message = self._validate_api_key()
+        if not is_valid:
+            raise RuntimeError(message)
+        
+        numbered = {str(number): description for number, description in enumerate(descriptions, start=1)}
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": f"You are a financial categorization assistant. Categorize each numbered expense into one of these categories: {', '.join(EXPENSE_CATEGORIES)}. Return only a JSON object mapping every expense number to its category name."},
+                    {"role": "user", "content": f"Categorize these expenses: {json.dumps(numbered, ensure_ascii=False)}"}
+                ],
+                response_format={"type": "json_object"},
+                max_tokens=AI_CATEGORIZE_ANSWER_TOKENS * len(numbered) + 20,
+                temperature=0.3,
+                timeout=AI_CATEGORIZE_TIMEOUT if len(numbered) == 1 else AI_CATEGORIZE_BATCH_TIMEOUT
+            )
+        except Exception as e:
+            self._record_api_error(str(e))
+            raise
+        
+        answers = parse_category_mapping(response.choices[0].message.content, numbered)
+        categories = {numbered[number]: category for number, category in answers.items()}
+        if categories:
+            self._learn_categories(list(categories.items()))
+        return categories
+    
+    def ai_categorize_expense(self, description: str) -> str:
+        """Use AI to categorize expense with better error handling
+        
+        Descriptions seen before are answered from the category cache, and
+        the local model answers when it is confident; the LLM is only asked
+        otherwise. Without a working LLM the local model's best guess is used.
+        """
+        return self.ai_categorize_expenses([description])[description]
+    
+    def _report_categorization_error(self, error_str: str):
+        """Tell the user why an LLM categorization failed"""
+        if "401" in error_str:
+            self._error("🔑 Invalid OpenAI API key. Please check your key at https://platform.openai.com/api-keys")
+        elif "insufficient_quota" in error_str:
+            self._error("💳 OpenAI quota exceeded. Please check your billing at https://platform.openai.com/account/billing")
+        else:
+            self._warn(f"⚠️ AI categorization unavailable: {error_str[:50]}...")
+    
+    @property
+    def categorization_queue(self) -> CategorizationQueue:
+        """Background queue that categorizes provisionally stored expenses"""
+        if self._categorization_queue is None:
+            self._categorization_queue = CategorizationQueue(
+                self._llm_categorize_many, self._apply_background_category,
+                max_workers=CATEGORIZATION_WORKERS
+            )
+        return self._categorization_queue
+    
+    def _apply_background_category(self, transaction_id: int, description: str, category: str):
+        """Write a category found by the background queue back to the store"""
+        with self._ledger_lock.write():
+            indexed = self._current_search_index()
+            try:
+                if self.storage.update_category(transaction_id, category):
+                    indexed = self._after_own_write(indexed)
+            finally:
+                self._invalidate_cache()
+            self._update_search_index(indexed)
+        self.pending_categories.discard_many([transaction_id])
+    
+    def resume_pending_categorization(self) -> int:
+        """Queue expenses an earlier run left with a provisional category; return how many
+        
+        IDs whose expense no longer exists are forgotten. While the LLM is
+        unavailable nothing is queued and the rows stay marked.
+        """
+        pending = self.pending_categories.ids()
+        if not pending:
+            return 0
+        ledger = self._load_ledger()
+        expenses = ledger[ledger['id'].isin(pending) & (ledger['type'] == 'expense')]
+        gone = pending - set(expenses['id'].astype(int))
+        if gone:
+            self.pending_categories.discard_many(gone)
+        if expenses.empty or not self._llm_available():
+            return 0
+        self.categorization_queue.submit_many(zip(expenses['id'].astype(int).tolist(),
+                                                  expenses['description'].fillna('').tolist()))
+        return len(expenses)
+    
+    def wait_for_categorization(self, timeout: float = None) -> bool:
+        """Block until background categorization finishes; return False on timeout"""
+        if self._categorization_queue is None:
+            return True
+        return self._categorization_queue.wait(timeout)
+    
+    def ai_categorize_expenses(self, descriptions: List[str]) -> Dict[str, str]:
+        """Categorize a batch of expense descriptions, returning description -> category
+        
+        Each distinct description is answered offline when possible (see
+        ai_categorize_expense). The rest are sent to the LLM one per
+        normalized description, packed into as few batched requests as the
+        token budget allows; anything still unsettled gets the local
+        model's best guess.
+        """
+        categories, fallbacks = {}, {}
+        unsettled = {}  # normalized description -> descriptions sharing it
+        for description in dict.fromkeys(descriptions):
+            category, fallbacks[description] = self._categorize_offline(description)
+            if category:
+                categories[description] = category
+            else:
+                unsettled.setdefault(normalize_description(description), []).append(description)
+        
+        if unsettled and os.getenv('OPENAI_API_KEY'):
+            is_valid, message = self._validate_api_key()
+            if not is_valid:
+                self._warn(f"🔑 AI categorization unavailable: {message}")
+            else:
+                representatives = [group[0] for group in unsettled.values()]
+                for batch in chunk_descriptions(representatives):
+                    try:
+                        answers = self._llm_categorize_many(batch)
+                    except Exception as e:
+                        self._report_categorization_error(str(e))
+                        break
+                    for representative, category in answers.items():
+                        for description in unsettled[normalize_description(representative)]:
+                            categories[description] = category
+        
+        return {description: categories.get(description, fallback) for description, fallback in fallbacks.items()}
+    
+    def _summary_cube(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Aggregate ``df`` in one pass into (type, month, category) totals
+        
+        Returns one row per (type, period, category) with 'total', 'count'
+        and 'largest' amounts; 'period' is year * 100 + month and
+        'year_month' its 'YYYY-MM' label. The cube is memoized per frame, so
+        the balance, summary, overview and chart methods called with the
+        same frame during a render share a single groupby. Frames must not
+        be mutated after being passed in.
+        """
+        info = self._frame_info(df, create=True)
+        if info.get('cube') is None:
+            info['cube'] = self._with_year_month(build_rollup(df))
+        return info['cube']
+    
+    def _frame_info(self, df: pd.DataFrame, create: bool = False) -> Dict:
+        """Return the memo dict of ``df`` (its summary cube and load_data view)"""
+        with self._frame_memo_lock:
+            memo = self._frame_memo.get(id(df))
+            if memo is not None and memo[0]() is df:
+                return memo[1]
+            if not create:
+                return {}
+            # Forget frames that no longer exist
+            self._frame_memo = {key: value for key, value in self._frame_memo.items() if value[0]() is not None}
+            info = {}
+            self._frame_memo[id(df)] = (weakref.ref(df), info)
+            return info
+    
+    @staticmethod
+    def _with_year_month(cube: pd.DataFrame) -> pd.DataFrame:
+        """Add the 'YYYY-MM' label of each cube period"""
+        cube = cube.copy()
+        cube['year_month'] = [None if pd.isna(p) else f"{int(p) // 100:04d}-{int(p) % 100:02d}"
+                              for p in cube['period']]
+        return cube
+    
+    @staticmethod
+    def _type_totals(cube: pd.DataFrame) -> Dict[str, int]:
+        """Return total centavos per transaction type"""
+        return cube.groupby('type', observed=True)['total'].sum().to_dict()
+    
+    @staticmethod
+    def _category_totals(cube: pd.DataFrame, transaction_type: str) -> pd.Series:
+        """Return total amount per category for one transaction type"""
+        rows = cube[(cube['type'] == transaction_type) & cube['category'].notna()]
+        return rows.groupby('category', observed=True)['total'].sum()
+    
+    @staticmethod
+    def _monthly_type_totals(cube: pd.DataFrame) -> pd.DataFrame:
+        """Return total pesos per (year_month, type), for plotting"""
+        totals = cube.dropna(subset=['year_month']).groupby(['year_month', 'type'], observed=True)['total'].sum()
+        return to_pesos(totals).reset_index().rename(columns={'total': 'amount'})
+    
+    def get_balance(self, df: pd.DataFrame) -> int:
+        """Calculate current balance in centavos (income - expenses - savings)"""
+        if df.empty:
+            return 0
+        totals = self._type_totals(self._summary_cube(df))
+        return int(totals.get('income', 0) - totals.get('expense', 0) - totals.get('savings', 0))
+    
+    def get_total_savings(self, df: pd.DataFrame) -> int:
+        """Calculate total savings accumulated, in centavos"""
+        if df.empty:
+            return 0
+        return int(self._type_totals(self._summary_cube(df)).get('savings', 0))
+    
+    def get_monthly_summary(self, df: pd.DataFrame, year: int = None, month: int = None) -> Dict:
+        """Get monthly financial summary, with amounts in centavos"""
+        if df.empty:
+            return {'income': 0, 'expenses': 0, 'balance': 0, 'expense_by_category': {}, 'transaction_count': 0}
+        
+        if not year:
+            year = datetime.now().year
+        if not month:
+            month = datetime.now().month
+            
+        # Filter for the specific month
+        cube = self._summary_cube(df)
+        monthly_cube = cube[cube['period'] == year * 100 + month]
+        
+        if monthly_cube.empty:
+            return {'income': 0, 'expenses': 0, 'balance': 0, 'expense_by_category': {}, 'transaction_count': 0}
+        
+        totals = self._type_totals(monthly_cube)
+        income = int(totals.get('income', 0))
+        expenses = int(totals.get('expense', 0))
+        
+        # Group expenses by category
+        expense_by_category = {category: int(total) for category, total
+                               in self._category_totals(monthly_cube, 'expense').items()}
+        
+        return {
+            'income': income,
+            'expenses': expenses,
+            'balance': income - expenses,
+            'expense_by_category': expense_by_category,
+            'transaction_count': int(monthly_cube['count'].sum())
+        }
+    
+    @_cached_figure
+    def create_expense_pie_chart(self, df: pd.DataFrame):
+        """Create pie chart of expenses by category"""
+        if df.empty:
+            return None
+        
+        category_totals = self._category_totals(self._summary_cube(df), 'expense')
+        if category_totals.empty:
+            return None
+        
+        category_totals = to_pesos(category_totals).rename('amount').reset_index()
+        
+        import plotly.express as px
+        fig = px.pie(category_totals, values='amount', names='category', 
+                    title='Expenses by Category')
+        return fig
+    
+    @_cached_figure
+    def create_monthly_trend_chart(self, df: pd.DataFrame):
+        """Create monthly trend chart"""
+        if df.empty:
+            return None
+        
+        # Group by month and type
+        monthly_data = self._monthly_type_totals(self._summary_cube(df))
+        
+        import plotly.express as px
+        fig = px.line(monthly_data, x='year_month', y='amount', color='type',
+                     title='Monthly Income vs Expenses Trend',
+                     labels={'year_month': 'Month', 'amount': 'Amount (₱)'})
+        return fig
+    
+    @_cached_figure
+    def create_balance_chart(self, df: pd.DataFrame, freq: str = None):
+        """Create running balance chart
+        
+        Income adds to the balance while expenses and savings subtract from
+        it, as in get_balance. Pass ``freq`` (e.g. 'D' or 'W') to plot one
+        closing balance per period instead of one point per transaction.
+        """
+        if df.empty:
+            return None
+        
+        # Sort by date
+        df_sorted = df.sort_values('date', kind='mergesort')
+        
+        # Calculate running balance
+        signed_amount = df_sorted['amount'].where(df_sorted['type'] == 'income', -df_sorted['amount'])
+        balance = pd.DataFrame({
+            'date': df_sorted['date'],
+            'running_balance': to_pesos(signed_amount.cumsum())
+        })
+        
+        if freq:
+            # Closing balance of each period that has transactions
+            balance = (balance.groupby(balance['date'].dt.to_period(freq).dt.start_time)['running_balance']
+                       .last().reset_index())
+        
+        import plotly.express as px
+        fig = px.line(balance, x='date', y='running_balance',
+                     title='Running Balance Over Time',
+                     labels={'date': 'Date', 'running_balance': 'Balance (₱)'})
+        return fig
+    
+    @_cached_figure
+    def create_category_bar_chart(self, df: pd.DataFrame):
+        """Create horizontal bar chart of spending by category"""
+        if df.empty:
+            return None
+        
+        category_totals = self._category_totals(self._summary_cube(df), 'expense')
+        if category_totals.empty:
+            return None
+        
+        category_totals = to_pesos(category_totals.sort_values(ascending=True))
+        
+        import plotly.express as px
+        fig = px.bar(x=category_totals.values, y=category_totals.index,
+                    orientation='h',
+                    title='Spending by Category',
+                    labels={'x': 'Amount (₱)', 'y': 'Category'})
+        return fig
+    
+    @_cached_figure
+    def create_savings_pie_chart(self, df: pd.DataFrame):
+        """Create pie chart of savings by category"""
+        if df.empty:
+            return None
+        
+        category_totals = self._category_totals(self._summary_cube(df), 'savings')
+        if category_totals.empty:
+            return None
+        
+        category_totals = to_pesos(category_totals).rename('amount').reset_index()
+        
+        import plotly.express as px
+        fig = px.pie(category_totals, values='amount', names='category', 
+                    title='Savings by Category',
+                    color_discrete_sequence=px.colors.sequential.Greens_r)
+        return fig
+    
+    @_cached_figure
+    def create_savings_trend_chart(self, df: pd.DataFrame):
+        """Create cumulative savings trend chart"""
+        if df.empty:
+            return None
+        
+        savings = df[df['type'] == 'savings'].sort_values('date')
+        if savings.empty:
+            return None
+        
+        # Calculate cumulative savings
+        savings['cumulative_savings'] = to_pesos(savings['amount'].cumsum())
+        
+        import plotly.express as px
+        fig = px.line(savings, x='date', y='cumulative_savings',
+                     title='Cumulative Savings Over Time',
+                     labels={'date': 'Date', 'cumulative_savings': 'Total Savings (₱)'},
+                     line_shape='linear',
+                     color_discrete_sequence=['#00CC96'])
+        
+        # Add markers for each savings transaction
+        fig.add_scatter(x=savings['date'], y=savings['cumulative_savings'],
+                       mode='markers',
+                       marker=dict(size=8, color='#00CC96'),
+                       showlegend=False)
+        
+        return fig
+    
+    @_cached_figure
+    def create_income_expense_savings_chart(self, df: pd.DataFrame):
+        """Create comprehensive chart showing income, expenses, and savings by month"""
+        if df.empty:
+            return None
+        
+        # Group by month and type
+        monthly_data = self._monthly_type_totals(self._summary_cube(df))
+        
+        import plotly.express as px
+        fig = px.bar(monthly_data, x='year_month', y='amount', color='type',
+                    title='Monthly Income, Expenses & Savings',
+                    labels={'year_month': 'Month', 'amount': 'Amount (₱)'},
+                    color_discrete_map={
+                        'income': '#00CC96',
+                        'expense': '#EF553B', 
+                        'savings': '#AB63FA'
+                    })
+        return fig
+    
+    def ai_spending_analysis(self, df: pd.DataFrame) -> str:
+        """Get AI-powered spending analysis with better error handling"""
+        if df.empty:
+            return "📊 No transaction data available for analysis. Add some transactions first!"
+        
+        if not os.getenv('OPENAI_API_KEY'):
+            return "🔑 AI analysis requires an OpenAI API key. Please set OPENAI_API_KEY in your environment variables."
+        
+        # Validate API key first
+        is_valid, message = self._validate_api_key()
+        if not is_valid:
+            return f"🔑 AI analysis unavailable: {message}"
+        
+        summary = self._summary_in_pesos(self.get_monthly_summary(df))
+        recent_expenses = self._storage_frame(df[df['type'] == 'expense'].tail(10)).to_dict('records')
+        
+        analysis_data = {
+            'monthly_summary': summary,
+            'recent_expenses': recent_expenses,
+            'balance': to_pesos(self.get_balance(df))
+        }
+        
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a financial advisor. Analyze the spending data and provide insights, patterns, and recommendations. Be concise but helpful. Focus on practical advice."},
+                    {"role": "user", "content": f"Analyze this financial data: {str(analysis_data)}"}
+                ],
+                max_tokens=300,
+                temperature=0.7
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            error_str = str(e)
+            self._record_api_error(error_str)
+            if "401" in error_str:
+                return "🔑 Invalid OpenAI API key. Please check your key at https://platform.openai.com/api-keys"
+            elif "insufficient_quota" in error_str:
+                return "💳 OpenAI quota exceeded. Please check your billing at https://platform.openai.com/account/billing"
+            elif "rate_limit" in error_str:
+                return "⏱️ Rate limit exceeded. Please try again in a few minutes."
+            else:
+                return f"⚠️ AI analysis unavailable: {error_str[:100]}..."
+    
+    @staticmethod
+    def _summary_in_pesos(summary: Dict) -> Dict:
+        """Return a monthly summary with its amounts in pesos, for AI prompts"""
+        return dict(summary,
+                    income=to_pesos(summary['income']),
+                    expenses=to_pesos(summary['expenses']),
+                    balance=to_pesos(summary['balance']),
+                    expense_by_category={category: to_pesos(total) for category, total
+                                         in summary['expense_by_category'].items()})
+    
+    def ai_budget_recommendations(self, df: pd.DataFrame, monthly_income: float) -> str:
+        """Get AI-powered budget recommendations for a ``monthly_income`` in pesos"""
+        if df.empty:
+            return "📊 No spending data available for recommendations. Add some transactions first!"
+        
+        if not os.getenv('OPENAI_API_KEY'):
+            return "🔑 Budget recommendations require an OpenAI API key. Please set OPENAI_API_KEY in your environment variables."
+        
+        if monthly_income <= 0:
+            return "💰 Please enter a valid monthly income amount to get personalized recommendations."
+        
+        # Validate API key first
+        is_valid, message = self._validate_api_key()
+        if not is_valid:
+            return f"🔑 Budget recommendations unavailable: {message}"
+        
+        summary = self._summary_in_pesos(self.get_monthly_summary(df))
+        
+        try:
+            response = self.client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a financial advisor. Based on income and spending patterns, provide budget recommendations using the 50/30/20 rule or other appropriate strategies. Be specific and actionable."},
+                    {"role": "user", "content": f"Monthly income: ₱{monthly_income:,.2f}, Current spending summary: {str(summary)}"}
+                ],
+                max_tokens=400,
+                temperature=0.7
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            error_str = str(e)
+            self._record_api_error(error_str)
+            if "401" in error_str:
+                return "🔑 Invalid OpenAI API key. Please check your key at https://platform.openai.com/api-keys"
+            elif "insufficient_quota" in error_str:
+                return "💳 OpenAI quota exceeded. Please check your billing at https://platform.openai.com/account/billing"
+            elif "rate_limit" in error_str:
+                return "⏱️ Rate limit exceeded. Please try again in a few minutes."
+            else:
+                return f"⚠️ Budget recommendations unavailable: {error_str[:100]}..."
+    
+    def load_user_profile(self) -> Dict:
+        """Load user profile settings"""
+        try:
+            if os.path.exists(self.user_profile_file):
+                df = pd.read_excel(self.user_profile_file)
+                profile = {}
+                for _, row in df.iterrows():
+                    profile[row['setting']] = row['value']
+                return profile
+            else:
+                return {
+                    'monthly_income': 0,
+                    'savings_goal': 0,
+                    'expense_limit': 0,
+                    'setup_completed': False,
+                    'created_date': datetime.now().strftime('%Y-%m-%d')
+                }
+        except Exception as e:
+            self._error(f"Error loading user profile: {str(e)}")
+            return {'monthly_income': 0, 'savings_goal': 0, 'expense_limit': 0, 'setup_completed': False}
+    
+    def save_user_profile(self, profile_data: Dict):
+        """Save user profile settings"""
+        try:
+            data = []
+            for key, value in profile_data.items():
+                data.append({'setting': key, 'value': value})
+            
+            df = pd.DataFrame(data)
+            df.to_excel(self.user_profile_file, index=False, sheet_name='UserProfile')
+        except Exception as e:
+            self._error(f"Error saving user profile: {str(e)}")
+    
+    def is_first_time_user(self) -> bool:
+        """Check if this is a first-time user"""
+        profile = self.load_user_profile()
+        return not profile.get('setup_completed', False)
+    
+    def get_financial_overview(self, df: pd.DataFrame, view_type: str = 'all') -> Dict:
+        """Get comprehensive financial overview with different view types, with amounts in centavos"""
+        if df.empty:
+            return {
+                'total_balance': 0,
+                'total_income': 0,
+                'total_expenses': 0,
+                'avg_monthly_income': 0,
+                'avg_monthly_expenses': 0,
+                'largest_expense': 0,
+                'most_frequent_category': 'N/A',
+                'transaction_count': 0,
+                'date_range': 'No data'
+            }
+        
+        # Filter data based on view type
+        filtered_df = self.slice_dates(df, *self.get_period_bounds(view_type))
+        
+        if filtered_df.empty:
+            return self.get_financial_overview(pd.DataFrame(columns=df.columns), 'all')
+        
+        cube = self._summary_cube(filtered_df)
+        totals = self._type_totals(cube)
+        total_income = int(totals.get('income', 0))
+        total_expenses = int(totals.get('expense', 0))
+        total_savings = int(totals.get('savings', 0))
+        
+        expense_cube = cube[cube['type'] == 'expense']
+        savings_cube = cube[cube['type'] == 'savings']
+        # Most frequent category; ties go to the alphabetically first, like Series.mode
+        category_counts = expense_cube.dropna(subset=['category']).groupby('category', observed=True)['count'].sum().sort_index()
+        
+        # Calculate monthly averages
+        first_date, last_date = filtered_df['date'].min(), filtered_df['date'].max()
+        date_range = (last_date - first_date).days
+        months_span = max(1, date_range / 30.44)  # Average days per month
+        
+        return {
+            'total_balance': total_income - total_expenses - total_savings,
+            'total_income': total_income,
+            'total_expenses': total_expenses,
+            'total_savings': total_savings,
+            'avg_monthly_income': round(total_income / months_span),
+            'avg_monthly_expenses': round(total_expenses / months_span),
+            'avg_monthly_savings': round(total_savings / months_span),
+            'largest_expense': int(expense_cube['largest'].max()) if not expense_cube.empty else 0,
+            'largest_saving': int(savings_cube['largest'].max()) if not savings_cube.empty else 0,
+            'most_frequent_category': category_counts.idxmax() if not category_counts.empty else 'N/A',
+            'transaction_count': len(filtered_df),
+            'date_range': f"{first_date.strftime('%Y-%m-%d')} to {last_date.strftime('%Y-%m-%d')}"
+        }
\ No newline at end of file
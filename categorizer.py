@@ -0,0 +1,458 @@
+"""Expense categorization helpers for the budget tracker"""
+
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for_futures
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+EXPENSE_CATEGORIES = ['Food', 'Transportation', 'Entertainment', 'Healthcare',
+                      'Shopping', 'Utilities', 'Housing', 'Education', 'Other']
+
+# Estimated prompt tokens and descriptions allowed in one batched LLM request
+BATCH_TOKEN_BUDGET = 2000
+BATCH_MAX_DESCRIPTIONS = 100
+# Estimated tokens of JSON punctuation and numbering around each description
+BATCH_ITEM_OVERHEAD_TOKENS = 6
+
+
+def normalize_description(description: str) -> str:
+    """Normalize an expense description so recurring expenses share one key
+
+    Lowercases, replaces punctuation with spaces, drops purely numeric tokens
+    (invoice numbers, dates) and collapses whitespace.
+    """
+    tokens = re.sub(r'[^a-z0-9]+', ' ', str(description).lower()).split()
+    return ' '.join(token for token in tokens if not token.isdigit())
+
+
+def match_category(category: str) -> Optional[str]:
+    """Return the allowed category matching ``category`` case-insensitively"""
+    cleaned = str(category).strip().strip('."\'').lower()
+    for allowed in EXPENSE_CATEGORIES:
+        if allowed.lower() == cleaned:
+            return allowed
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the prompt tokens of ``text`` (about four characters each)"""
+    return len(str(text)) // 4 + 1
+
+
+def chunk_descriptions(descriptions: Iterable[str], token_budget: int = BATCH_TOKEN_BUDGET,
+                       max_items: int = BATCH_MAX_DESCRIPTIONS) -> List[List[str]]:
+    """Split descriptions into batches that each fit one categorization request
+
+    A batch closes once its estimated tokens would pass ``token_budget`` or
+    it holds ``max_items`` descriptions; a description too long for the
+    budget gets a batch of its own.
+    """
+    chunks, chunk, used = [], [], 0
+    for description in descriptions:
+        cost = estimate_tokens(description) + BATCH_ITEM_OVERHEAD_TOKENS
+        if chunk and (used + cost > token_budget or len(chunk) >= max_items):
+            chunks.append(chunk)
+            chunk, used = [], 0
+        chunk.append(description)
+        used += cost
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def parse_category_mapping(content: str, ids: Iterable[str]) -> Dict[str, str]:
+    """Parse an LLM's JSON object of ID -> category
+
+    Only the given IDs are kept, and only with a category from
+    EXPENSE_CATEGORIES. Text around the object and a single wrapping key
+    (e.g. {"categories": {...}}) are tolerated; anything unreadable gives
+    an empty mapping.
+    """
+    match = re.search(r'\{.*\}', content or '', re.DOTALL)
+    try:
+        data = json.loads(match.group(0)) if match else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return {}
+    if len(data) == 1 and isinstance(next(iter(data.values())), dict):
+        data = next(iter(data.values()))
+
+    wanted = {str(transaction_id) for transaction_id in ids}
+    categories = {}
+    for key, category in data.items():
+        key = str(key).strip()
+        category = match_category(category) if isinstance(category, str) else None
+        if key in wanted and category:
+            categories[key] = category
+    return categories
+
+
+class CategoryCache:
+    """Persistent LRU map of normalized description -> category
+
+    Entries live in a small JSON file so recurring expenses are categorized
+    without a network call across restarts. The least recently used entries
+    are evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(self, path: str = 'category_cache.json', max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as cache_file:
+                data = json.load(cache_file)
+            self._entries = OrderedDict(data.get('entries', []))
+            self.hits = int(data.get('hits', 0))
+            self.misses = int(data.get('misses', 0))
+        except (OSError, ValueError):
+            # A corrupt cache is only a lost optimisation; start over
+            self._entries = OrderedDict()
+
+    def save(self):
+        """Write the cache to disk atomically"""
+        with self._lock:
+            data = {
+                'entries': list(self._entries.items()),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+        # A private temp file per save, so concurrent saves can't clobber each other
+        handle, temp_path = tempfile.mkstemp(prefix='.category_cache.', suffix='.tmp',
+                                             dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(handle, 'w', encoding='utf-8') as cache_file:
+            json.dump(data, cache_file)
+        os.replace(temp_path, self.path)
+
+    def exists(self) -> bool:
+        """Return True if the cache has been persisted before"""
+        return os.path.exists(self.path)
+
+    def get(self, description: str) -> Optional[str]:
+        """Return the cached category for ``description``, counting a hit or miss"""
+        key = normalize_description(description)
+        with self._lock:
+            category = self._entries.get(key)
+            if category is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return category
+
+    def put(self, description: str, category: str, save: bool = True):
+        """Remember the category for ``description``"""
+        self.update([(description, category)], save=save)
+
+    def update(self, pairs: Iterable[Tuple[str, str]], save: bool = True):
+        """Remember many (description, category) pairs, oldest first"""
+        changed = False
+        with self._lock:
+            for description, category in pairs:
+                key = normalize_description(description)
+                if not key:
+                    continue
+                changed = changed or self._entries.get(key) != category
+                self._entries[key] = category
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if changed and save:
+            self.save()
+
+    def stats(self) -> Dict:
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class PendingCategories:
+    """Persistent set of IDs of expenses stored with a provisional category
+
+    The IDs live in a small JSON file next to the store, so expenses still
+    waiting for the LLM are queued again after a restart and their guessed
+    categories are never taken for confirmed ones. The file is re-read
+    before every change, so trackers in other processes see each other's
+    updates.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self) -> set:
+        try:
+            with open(self.path, encoding='utf-8') as pending_file:
+                return {int(transaction_id) for transaction_id in json.load(pending_file).get('ids', [])}
+        except (OSError, ValueError, TypeError, AttributeError):
+            # A missing or corrupt file only means the guesses count as confirmed
+            return set()
+
+    def _write(self, ids: set):
+        handle, temp_path = tempfile.mkstemp(prefix='.pending.', suffix='.tmp',
+                                             dir=os.path.dirname(os.path.abspath(self.path)))
+        with os.fdopen(handle, 'w', encoding='utf-8') as pending_file:
+            json.dump({'ids': sorted(ids)}, pending_file)
+        os.replace(temp_path, self.path)
+
+    def _change(self, added: Iterable[int] = (), removed: Iterable[int] = ()):
+        with self._lock:
+            ids = self._read()
+            changed = (ids | {int(i) for i in added}) - {int(i) for i in removed}
+            if changed != ids:
+                self._write(changed)
+
+    def ids(self) -> set:
+        """Return the IDs still waiting for a confirmed category"""
+        with self._lock:
+            return self._read()
+
+    def add_many(self, transaction_ids: Iterable[int]):
+        """Mark transactions as provisionally categorized"""
+        self._change(added=transaction_ids)
+
+    def discard_many(self, transaction_ids: Iterable[int]):
+        """Forget transactions that got a confirmed category or were deleted"""
+        self._change(removed=transaction_ids)
+
+
+class LocalCategorizer:
+    """Multinomial naive Bayes over description word n-grams
+
+    Trained incrementally from already-categorized expenses, so common
+    descriptions are categorized offline in microseconds. ``predict`` returns
+    a confidence for the best category, which callers use to decide whether
+    to defer to the LLM. It is the posterior over every allowed category,
+    scaled down by the share of the description's features the model has
+    never seen, and 0.0 unless at least ``min_matched_features`` features
+    are known and the category has ``min_examples`` examples.
+    """
+
+    def __init__(self, categories: Iterable[str] = EXPENSE_CATEGORIES, alpha: float = 1.0,
+                 min_matched_features: int = 2, min_examples: int = 3):
+        self.categories = list(categories)
+        self.alpha = alpha
+        self.min_matched_features = min_matched_features
+        self.min_examples = min_examples
+        self._doc_counts = {category: 0 for category in self.categories}
+        self._feature_counts = {category: {} for category in self.categories}
+        self._feature_totals = {category: 0 for category in self.categories}
+        self._vocabulary = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _features(description: str) -> list:
+        """Return word unigrams and bigrams of the normalized description"""
+        tokens = normalize_description(description).split()
+        return tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+
+    @property
+    def trained_count(self) -> int:
+        """Number of examples the model has learned from"""
+        return sum(self._doc_counts.values())
+
+    def learn(self, description: str, category: str):
+        """Add one labelled example"""
+        self.learn_many([(description, category)])
+
+    def learn_many(self, pairs: Iterable[Tuple[str, str]]):
+        """Add many labelled examples"""
+        with self._lock:
+            for description, category in pairs:
+                category = match_category(category)
+                features = self._features(description)
+                if category not in self._doc_counts or not features:
+                    continue
+                self._doc_counts[category] += 1
+                counts = self._feature_counts[category]
+                for feature in features:
+                    counts[feature] = counts.get(feature, 0) + 1
+                self._feature_totals[category] += len(features)
+                self._vocabulary.update(features)
+
+    def predict(self, description: str) -> Tuple[Optional[str], float]:
+        """Return (best category, confidence), or (None, 0.0) if nothing is known"""
+        with self._lock:
+            all_features = self._features(description)
+            features = [f for f in all_features if f in self._vocabulary]
+            total_docs = sum(self._doc_counts.values())
+            if not features or total_docs == 0:
+                return None, 0.0
+
+            vocabulary_size = len(self._vocabulary)
+            prior_denominator = total_docs + self.alpha * len(self.categories)
+            scores = {}
+            for category in self.categories:
+                # Smoothed prior, so categories without examples still compete
+                counts = self._feature_counts[category]
+                denominator = self._feature_totals[category] + self.alpha * vocabulary_size
+                score = math.log((self._doc_counts[category] + self.alpha) / prior_denominator)
+                for feature in features:
+                    score += math.log((counts.get(feature, 0) + self.alpha) / denominator)
+                scores[category] = score
+            best = max(scores, key=scores.get)
+            enough_evidence = (len(features) >= self.min_matched_features and
+                               self._doc_counts[best] >= self.min_examples)
+
+        if not enough_evidence:
+            return best, 0.0
+        # Softmax over log scores gives the posterior of the best category;
+        # words the model has never seen count against it
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, (1.0 / normalizer) * (len(features) / len(all_features))
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Return True if an API error means we should back off and retry"""
+    error_str = str(error)
+    return "rate_limit" in error_str or "429" in error_str
+
+
+class CategorizationQueue:
+    """Background pool that categorizes provisionally stored expenses
+
+    Expenses are saved straight away with a provisional category and their
+    IDs submitted here. Pending IDs sharing a normalized description are
+    coalesced, and worker threads (at most ``max_workers`` requests in
+    flight) send the queued descriptions to ``categorize_many`` in batches
+    that fit ``token_budget`` (see chunk_descriptions), with exponential
+    backoff on rate limits. ``categorize_many`` returns description ->
+    category, and each answer is handed to ``on_result(transaction_id,
+    description, category)`` for write-back.
+    """
+
+    def __init__(self, categorize_many: Callable[[List[str]], Dict[str, str]],
+                 on_result: Callable[[int, str, str], None],
+                 max_workers: int = 2, max_retries: int = 5, base_delay: float = 1.0,
+                 token_budget: int = BATCH_TOKEN_BUDGET, max_batch: int = BATCH_MAX_DESCRIPTIONS):
+        self._categorize_many = categorize_many
+        self._on_result = on_result
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.token_budget = token_budget
+        self.max_batch = max_batch
+        self._executor = None
+        self._pending = {}  # normalized description -> [(transaction_id, description)]
+        self._queued = []  # normalized descriptions not yet sent, oldest first
+        self._workers = 0
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, transaction_id: int, description: str):
+        """Queue one stored expense for background categorization"""
+        self.submit_many([(transaction_id, description)])
+
+    def submit_many(self, expenses: Iterable[Tuple[int, str]]):
+        """Queue (transaction ID, description) pairs for background categorization"""
+        started = []
+        with self._lock:
+            for transaction_id, description in expenses:
+                key = normalize_description(description)
+                if key in self._pending:
+                    self._pending[key].append((transaction_id, description))
+                    continue
+                self._pending[key] = [(transaction_id, description)]
+                self._queued.append(key)
+            # Each worker keeps taking batches until the queue is empty
+            while self._queued and self._workers < self.max_workers:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='categorizer')
+                future = self._executor.submit(self._drain)
+                self._workers += 1
+                self._futures.add(future)
+                started.append(future)
+        for future in started:
+            future.add_done_callback(self._discard_future)
+
+    def _discard_future(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def _take_batch(self) -> List[Tuple[str, str]]:
+        """Remove the next batch of (key, description) from the queue; call with the lock held"""
+        keys = self._queued[:self.max_batch]
+        descriptions = [self._pending[key][0][1] for key in keys]
+        batch_size = len(chunk_descriptions(descriptions, self.token_budget, self.max_batch)[0])
+        del self._queued[:batch_size]
+        return list(zip(keys[:batch_size], descriptions[:batch_size]))
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if not self._queued:
+                    self._workers -= 1
+                    return
+                batch = self._take_batch()
+            categories = self._categorize_batch([description for _, description in batch])
+
+            with self._lock:
+                waiting = [(self._pending.pop(key, []), description) for key, description in batch]
+            for expenses, description in waiting:
+                category = categories.get(description)
+                if not category:
+                    continue
+                for transaction_id, original_description in expenses:
+                    try:
+                        self._on_result(transaction_id, original_description, category)
+                    except Exception:
+                        # A failed write-back leaves the provisional category in place
+                        continue
+
+    def _categorize_batch(self, descriptions: List[str]) -> Dict[str, str]:
+        """Call ``categorize_many``, retrying with backoff on rate limits; {} if it fails"""
+        delay = self.base_delay
+        for attempt in range(self.max_retries):
+            try:
+                return self._categorize_many(descriptions) or {}
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries - 1:
+                    break
+                time.sleep(delay + random.uniform(0, delay / 2))
+                delay *= 2
+        return {}
+
+    def pending_count(self) -> int:
+        """Number of expenses still waiting for a category"""
+        with self._lock:
+            return sum(len(waiting) for waiting in self._pending.values())
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until every queued expense is processed; return False on timeout"""
+        with self._lock:
+            futures = list(self._futures)
+        _, not_done = wait_for_futures(futures, timeout=timeout)
+        return not not_done
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,124 @@
+"""Streaming readers for importing transactions from Excel and CSV files"""
+
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+IMPORT_COLUMNS = ['type', 'amount', 'description', 'category', 'date']
+
+# Rows validated and stored per write while importing
+IMPORT_BATCH_SIZE = 1000
+
+
+def _column_name(value) -> str:
+    """Normalize a header cell so 'Amount ' and 'amount' name the same column"""
+    return '' if value is None else str(value).strip().lower()
+
+
+def _is_blank(values) -> bool:
+    """Return True if every cell of a row is empty"""
+    return all(value is None or value == '' or pd.isna(value) for value in values)
+
+
+class TransactionFileReader:
+    """Reads the rows of an uploaded .xlsx, .xls or .csv file a batch at a time
+
+    ``source`` is a path or binary file object and ``filename`` decides the
+    format. .xlsx files are streamed with openpyxl in read-only mode and CSV
+    files with pandas' chunked reader, so memory stays bounded by the batch
+    size. Legacy .xls files can't be streamed and are read whole.
+    """
+
+    def __init__(self, source, filename: str):
+        self.source = source
+        self.filename = filename
+        self.extension = str(filename).lower().rsplit('.', 1)[-1]
+        if self.extension not in ('xlsx', 'xls', 'csv'):
+            raise ValueError(f"Unsupported file type '.{self.extension}'")
+        self.columns = []
+        # Number of data rows if the format records it up front, else None
+        self.total_rows = None
+        self._read_header()
+
+    def _rewind(self):
+        if hasattr(self.source, 'seek'):
+            self.source.seek(0)
+
+    def _read_header(self):
+        self._rewind()
+        if self.extension == 'xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(self.source, read_only=True, data_only=True)
+            try:
+                sheet = workbook.active
+                header = next(sheet.iter_rows(max_row=1, values_only=True), ())
+                self.columns = [_column_name(value) for value in header]
+                if sheet.max_row:
+                    self.total_rows = max(sheet.max_row - 1, 0)
+            finally:
+                workbook.close()
+        elif self.extension == 'csv':
+            header = pd.read_csv(self.source, nrows=0)
+            self.columns = [_column_name(value) for value in header.columns]
+        else:
+            self._xls = pd.read_excel(self.source)
+            self._xls.columns = [_column_name(value) for value in self._xls.columns]
+            self.columns = list(self._xls.columns)
+            self.total_rows = len(self._xls)
+
+    def missing_columns(self) -> List[str]:
+        """Return the required import columns the file doesn't have"""
+        return [column for column in IMPORT_COLUMNS if column not in self.columns]
+
+    def numbered_rows(self) -> Iterator[Tuple[int, Dict]]:
+        """Yield (row number, row) for each non-blank data row
+
+        Rows are dicts keyed by normalized column name. Row numbers are the
+        ones a spreadsheet shows, with the header as row 1, and count the
+        blank rows that are skipped.
+        """
+        self._rewind()
+        if self.extension == 'xlsx':
+            from openpyxl import load_workbook
+            workbook = load_workbook(self.source, read_only=True, data_only=True)
+            try:
+                for row_number, values in enumerate(workbook.active.iter_rows(min_row=2, values_only=True),
+                                                    start=2):
+                    # Formatted but empty rows at the bottom of a sheet are common
+                    if _is_blank(values):
+                        continue
+                    yield row_number, dict(zip(self.columns, values))
+            finally:
+                workbook.close()
+        elif self.extension == 'csv':
+            row_number = 1
+            # Blank lines come back as empty rows so they still count
+            for chunk in pd.read_csv(self.source, chunksize=IMPORT_BATCH_SIZE, dtype=object,
+                                     skip_blank_lines=False):
+                chunk.columns = self.columns
+                for row in chunk.to_dict('records'):
+                    row_number += 1
+                    if not _is_blank(row.values()):
+                        yield row_number, row
+        else:
+            for row_number, row in enumerate(self._xls.to_dict('records'), start=2):
+                if not _is_blank(row.values()):
+                    yield row_number, row
+
+    def rows(self) -> Iterator[Dict]:
+        """Yield each non-blank data row as a dict keyed by normalized column name"""
+        return (row for _, row in self.numbered_rows())
+
+    def batches(self, batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[List[Tuple[int, Dict]]]:
+        """Yield lists of at most ``batch_size`` (row number, row) pairs"""
+        rows = self.numbered_rows()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def preview(self, count: int = 5) -> pd.DataFrame:
+        """Return the first ``count`` rows as a DataFrame"""
+        return pd.DataFrame(list(islice(self.rows(), count)), columns=self.columns)
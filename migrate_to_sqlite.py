@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Migrate an existing Excel ledger into a new transaction store
+
+Usage: python migrate_to_sqlite.py [excel file] [store file]
+
+The store type follows the store file's extension: .db or .sqlite for
+SQLite (the default, budget_data.db), .parquet or .pq for Parquet, and
+.csv for CSV.
+"""
+
+import sys
+
+from storage import migrate_excel_ledger
+
+
+def main():
+    """Run the one-shot migration, by default from budget_data.xlsx to budget_data.db"""
+    excel_file = sys.argv[1] if len(sys.argv) > 1 else 'budget_data.xlsx'
+    store_file = sys.argv[2] if len(sys.argv) > 2 else 'budget_data.db'
+
+    try:
+        count = migrate_excel_ledger(excel_file, store_file)
+    except Exception as e:
+        print(f"❌ Migration failed: {str(e)}")
+        sys.exit(1)
+
+    print(f"✅ Migrated {count} transactions from '{excel_file}' to '{store_file}'")
+    print(f"💡 '{excel_file}' was left untouched and can be kept as a backup")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Reader/writer lock for sharing one tracker between threads"""
+
+import threading
+from contextlib import contextmanager
+
+
+class ReadWriteLock:
+    """Lets many threads read at once while writes run alone
+
+    Waiting writers block new readers so a steady stream of reads can't
+    starve them. Both sides are re-entrant per thread, and the thread
+    holding the write lock may also take the read lock; upgrading a read
+    lock to a write lock is not supported.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = {}  # thread ident -> read depth
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        """Hold the lock for reading"""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._writers_waiting:
+                    self._condition.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers[me] -= 1
+                if not self._readers[me]:
+                    del self._readers[me]
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        """Hold the lock for writing"""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+            else:
+                if me in self._readers:
+                    raise RuntimeError("Cannot upgrade a read lock to a write lock")
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._condition.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = me
+                self._write_depth = 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._condition.notify_all()
@@ -7,7 +7,7 @@ This script creates realistic sample transactions for testing and demonstration
 import pandas as pd
 import random
 from datetime import datetime, timedelta
-from budget_tracker_web import BudgetTrackerWeb
+from budget_tracker import BudgetTracker
 
 def generate_sample_data():
     """Generate comprehensive sample data for the budget tracker"""
@@ -15,7 +15,7 @@ def generate_sample_data():
     print("🚀 Generating sample data for AI-Powered Budget Tracker...")
     
     # Initialize the tracker
-    tracker = BudgetTrackerWeb()
+    tracker = BudgetTracker()
     
     # Sample data categories and descriptions
     income_data = [
@@ -85,7 +85,7 @@ def generate_sample_data():
     
     # Generate transactions for the last 3 months
     start_date = datetime.now() - timedelta(days=90)
-    transactions_added = 0
+    records = []
     
     # Add monthly income (3 months)
     for month_offset in range(3):
@@ -100,14 +100,13 @@ def generate_sample_data():
             amount_variation = random.uniform(0.9, 1.1)
             amount = int(income['amount'] * amount_variation)
             
-            tracker.add_transaction(
-                'income',
-                amount,
-                income['description'],
-                income['category'],
-                transaction_date.date()
-            )
-            transactions_added += 1
+            records.append({
+                'type': 'income',
+                'amount': amount,
+                'description': income['description'],
+                'category': income['category'],
+                'date': transaction_date.date()
+            })
     
     # Add monthly savings (3 months)
     for month_offset in range(3):
@@ -124,14 +123,13 @@ def generate_sample_data():
             amount_variation = random.uniform(0.8, 1.2)
             amount = int(savings['amount'] * amount_variation)
             
-            tracker.add_transaction(
-                'savings',
-                amount,
-                savings['description'],
-                savings['category'],
-                transaction_date.date()
-            )
-            transactions_added += 1
+            records.append({
+                'type': 'savings',
+                'amount': amount,
+                'description': savings['description'],
+                'category': savings['category'],
+                'date': transaction_date.date()
+            })
     
     # Add random expenses throughout the period
     current_date = start_date
@@ -150,19 +148,21 @@ def generate_sample_data():
             if amount < 10:
                 continue
                 
-            tracker.add_transaction(
-                'expense',
-                amount,
-                expense['description'],
-                expense['category'],
-                current_date.date()
-            )
-            transactions_added += 1
+            records.append({
+                'type': 'expense',
+                'amount': amount,
+                'description': expense['description'],
+                'category': expense['category'],
+                'date': current_date.date()
+            })
         
         # Move to next day (with some random skips)
         skip_days = random.choices([1, 2, 3], weights=[70, 20, 10])[0]
         current_date += timedelta(days=skip_days)
     
+    # Store every generated transaction in a single write
+    transactions_added = len(tracker.add_transactions(records))
+    
     # Create sample user profile
     sample_profile = {
         'monthly_income': 65000,
@@ -180,7 +180,7 @@ def generate_sample_data():
     print(f"📊 Generated {transactions_added} transactions")
     print(f"👤 Created user profile with financial goals")
     print(f"📅 Data spans from {start_date.strftime('%Y-%m-%d')} to {datetime.now().strftime('%Y-%m-%d')}")
-    print(f"💾 Data saved to: {tracker.excel_file}")
+    print(f"💾 Data saved to: {tracker.storage.path}")
     print(f"👤 Profile saved to: {tracker.user_profile_file}")
     print("\n🚀 You can now run the budget tracker and explore all features!")
     print("💡 Run: streamlit run streamlit_app.py")
@@ -0,0 +1,87 @@
+"""Inverted index for searching transaction descriptions"""
+
+import bisect
+import re
+import threading
+from typing import Iterable, List, Set, Tuple
+
+
+def search_tokens(text: str) -> List[str]:
+    """Split text into the lowercase word tokens used for search"""
+    return re.findall(r'[^\W_]+', str(text).lower())
+
+
+class DescriptionIndex:
+    """In-memory inverted index of description words -> transaction IDs
+
+    Each query token matches every indexed word it is a prefix of, found by
+    binary search over the sorted vocabulary; a transaction matches when
+    all query tokens do. Transactions can be added and removed after the
+    index is built, so it can follow inserts and deletes without a rebuild.
+    """
+
+    def __init__(self):
+        self._postings = {}  # word -> set of transaction IDs
+        self._words = []  # sorted vocabulary
+        self._words_of = {}  # transaction ID -> its indexed words
+        self._lock = threading.Lock()
+
+    def add(self, transaction_id: int, description: str):
+        """Index one transaction's description"""
+        self.add_many([(transaction_id, description)])
+
+    def add_many(self, pairs: Iterable[Tuple[int, str]]):
+        """Index many (transaction ID, description) pairs"""
+        with self._lock:
+            new_words = set()
+            for transaction_id, description in pairs:
+                transaction_id = int(transaction_id)
+                words = set(search_tokens(description))
+                self._words_of[transaction_id] = self._words_of.get(transaction_id, set()) | words
+                for word in words:
+                    ids = self._postings.get(word)
+                    if ids is None:
+                        ids = self._postings[word] = set()
+                        new_words.add(word)
+                    ids.add(transaction_id)
+            if new_words:
+                self._words = sorted(new_words.union(self._words))
+
+    def remove(self, transaction_id: int):
+        """Drop one transaction from the index"""
+        with self._lock:
+            for word in self._words_of.pop(int(transaction_id), ()):
+                ids = self._postings[word]
+                ids.discard(int(transaction_id))
+                if not ids:
+                    del self._postings[word]
+                    position = bisect.bisect_left(self._words, word)
+                    del self._words[position]
+
+    def _prefix_matches(self, prefix: str) -> Set[int]:
+        """Return IDs of transactions with a word starting with ``prefix``"""
+        start = bisect.bisect_left(self._words, prefix)
+        matches = set()
+        for word in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            matches |= self._postings[word]
+        return matches
+
+    def search(self, query: str) -> Set[int]:
+        """Return IDs of transactions matching every token of ``query`` as a prefix"""
+        tokens = search_tokens(query)
+        if not tokens:
+            return set()
+        with self._lock:
+            # Rarest-looking (longest) tokens first keeps the intersection small
+            result = None
+            for token in sorted(set(tokens), key=len, reverse=True):
+                matches = self._prefix_matches(token)
+                result = matches if result is None else result & matches
+                if not result:
+                    return set()
+            return result
+
+    def __len__(self) -> int:
+        return len(self._postings)
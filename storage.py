@@ -0,0 +1,954 @@
+"""Storage backends for the budget tracker
+
+The tracker talks to a ``StorageBackend`` instead of reading and rewriting
+``budget_data.xlsx`` directly. ``SQLiteStorage`` is the default engine and does
+indexed single-row inserts and deletes. ``ParquetStorage`` and ``CSVStorage``
+keep the ledger in a single columnar or plain-text file, and ``ExcelStorage``
+in a spreadsheet for users who still want that; all three journal writes
+between rewrites.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from search_index import search_tokens
+
+TRANSACTION_COLUMNS = ['id', 'type', 'amount', 'description', 'category', 'date']
+
+# Stores keep amounts in pesos; the tracker works in whole centavos
+CENTAVOS_PER_PESO = 100
+
+
+def empty_transactions() -> pd.DataFrame:
+    """Return an empty ledger with the standard columns"""
+    return pd.DataFrame(columns=TRANSACTION_COLUMNS)
+
+
+def coerce_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a raw ledger frame to the standard columns and types"""
+    df = df.copy()
+    for column in TRANSACTION_COLUMNS:
+        if column not in df.columns:
+            df[column] = None
+    df = df[TRANSACTION_COLUMNS]
+    if len(df) > 0:
+        # Unparseable dates become NaT for the tracker's integrity check to repair
+        df['date'] = pd.to_datetime(df['date'], format='mixed', errors='coerce')
+    return df
+
+
+def to_centavos(amounts) -> pd.Series:
+    """Convert peso amounts to whole centavos
+
+    Returns int64, or nullable Int64 if some amounts are missing or not
+    numbers. Each amount is rounded to the nearest centavo once, half to
+    even like ``amount_to_centavos``, so sums of the result are exact.
+    """
+    pesos = pd.to_numeric(pd.Series(amounts), errors='coerce')
+    centavos = (pesos.mask(pesos.abs() == float('inf')) * CENTAVOS_PER_PESO).round()
+    return centavos.astype('Int64' if centavos.isna().any() else 'int64')
+
+
+def amount_to_centavos(amount: float) -> int:
+    """Convert one peso amount to whole centavos, rounding like ``to_centavos``"""
+    return int(round(float(amount) * CENTAVOS_PER_PESO))
+
+
+def to_pesos(centavos):
+    """Convert a centavo amount or Series back to pesos for storage or display"""
+    return centavos / CENTAVOS_PER_PESO
+
+
+def compact_transactions(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert a loaded ledger to the compact in-memory schema
+
+    ``type`` and ``category`` become categoricals, ``date`` datetime64,
+    ``id`` int32 and ``amount`` int64 centavos. Categories come from the
+    values present, so invalid types still show up for the integrity check,
+    and blank IDs or amounts stay missing until it repairs them.
+    """
+    df = df.copy()
+    df['type'] = df['type'].astype('category')
+    df['category'] = df['category'].astype('category')
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    ids = pd.to_numeric(df['id'], errors='coerce')
+    if ids.notna().all() and (ids.empty or ids.max() < 2 ** 31):
+        ids = ids.astype('int32')
+    df['id'] = ids
+    df['amount'] = to_centavos(df['amount'])
+    return df
+
+
+ROLLUP_COLUMNS = ['type', 'period', 'category', 'total', 'count', 'largest']
+
+
+def build_rollup(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate a ledger into (type, period, category) -> total/count/largest
+
+    ``df`` holds centavo amounts, as returned by ``compact_transactions``,
+    and so do the totals. ``period`` is year * 100 + month. Missing
+    categories form their own group.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    dates = df['date']
+    period = (dates.dt.year * 100 + dates.dt.month).rename('period')
+    return (df.groupby([df['type'], period, df['category']], dropna=False, observed=True, sort=False)
+            ['amount'].agg(total='sum', count='size', largest='max').reset_index())
+
+
+class StorageBackend:
+    """Interface implemented by every transaction store"""
+
+    path: str
+    # True if the backend maintains its own monthly rollup on every write
+    has_rollup = False
+    # True if the backend maintains its own description search index
+    has_search = False
+    # (signature before, signature after) of this instance's latest write,
+    # both read under the store's write lock, so callers can tell their own
+    # changes from other writers'. None if unknown or the last call wrote nothing.
+    last_write = None
+
+    def exists(self) -> bool:
+        """Return True if the underlying store has been created"""
+        return os.path.exists(self.path)
+
+    def signature(self) -> tuple:
+        """Return a cheap token that changes whenever the stored data changes"""
+        return _file_signature(self.path)
+
+    def create(self):
+        """Create an empty store"""
+        self.replace_all(empty_transactions())
+
+    def load(self) -> pd.DataFrame:
+        """Return every transaction ordered by ID"""
+        raise NotImplementedError
+
+    def compact_if_due(self):
+        """Merge pending journal writes into the store if enough have piled up"""
+
+    def replace_all(self, df: pd.DataFrame):
+        """Replace the whole ledger with ``df``"""
+        raise NotImplementedError
+
+    def insert(self, record: Dict) -> int:
+        """Insert one transaction and return its new ID"""
+        raise NotImplementedError
+
+    def insert_many(self, records: List[Dict]) -> List[int]:
+        """Insert a batch of transactions in one write and return their IDs"""
+        return [self.insert(record) for record in records]
+
+    def delete(self, transaction_id: int) -> bool:
+        """Delete one transaction; return False if the ID does not exist"""
+        raise NotImplementedError
+
+    def update_category(self, transaction_id: int, category: str) -> bool:
+        """Set the category of one transaction; return False if the ID does not exist"""
+        raise NotImplementedError
+
+    def update_rows(self, records: List[Dict]) -> int:
+        """Overwrite every field of existing transactions matched by 'id'; return how many matched"""
+        raise NotImplementedError
+
+    def monthly_rollup(self) -> pd.DataFrame:
+        """Return per-month totals; see ``build_rollup``"""
+        return build_rollup(compact_transactions(self.load()))
+
+    def search(self, query: str) -> List[int]:
+        """Return IDs of transactions whose description matches every query word as a prefix
+
+        Only backends with ``has_search`` implement this; the tracker keeps
+        its own index for the others.
+        """
+        raise NotImplementedError
+
+    def get(self, transaction_id: int) -> Optional[pd.Series]:
+        """Return one transaction, or None if the ID does not exist"""
+        df = self.load()
+        if df.empty or transaction_id not in df['id'].values:
+            return None
+        return df[df['id'] == transaction_id].iloc[0]
+
+
+class FileStorage(StorageBackend):
+    """Base for stores that keep the whole ledger in a single file
+
+    Rewriting the file on every change is O(n), so inserts and deletes are
+    appended to a JSON-lines journal next to it instead. The journal is
+    replayed on load and merged into the main file by ``compact_if_due``
+    once it grows past ``compact_threshold`` entries (or when ``compact`` is
+    called).
+
+    Writers from any thread or process serialize on an exclusive lock of
+    ``path + '.lock'`` and readers take a shared one. The main file is
+    replaced by renaming a fully written temporary file over it, so readers
+    never see a half-written ledger.
+    """
+
+    compact_threshold = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.lock_path = path + '.lock'
+        self._next_id = None
+        self._ids = None
+        self._journal_entries = None
+        # Store signature the ID counters were computed at
+        self._counters_signature = None
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) or os.path.exists(self.journal_path)
+
+    def signature(self) -> tuple:
+        return _file_signature(self.path) + _file_signature(self.journal_path)
+
+    def _read_file(self) -> pd.DataFrame:
+        """Read the main file without replaying the journal"""
+        raise NotImplementedError
+
+    def _write_file(self, df: pd.DataFrame, path: str):
+        """Write ``df`` as a complete ledger file at ``path``"""
+        raise NotImplementedError
+
+    def _replace_file(self, df: pd.DataFrame):
+        """Atomically replace the main file with ``df``"""
+        directory, name = os.path.split(os.path.abspath(self.path))
+        root, extension = os.path.splitext(name)
+        # Keep the extension so writers that pick a format from it still work
+        handle, temp_path = tempfile.mkstemp(prefix=f'.{root}.', suffix=extension, dir=directory)
+        os.close(handle)
+        try:
+            self._write_file(df, temp_path)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _read_journal(self) -> List[Dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+        with open(self.journal_path, encoding='utf-8') as journal:
+            lines = journal.read().split('\n')
+        # The last piece is empty unless an append was cut short; its entry
+        # was never acknowledged to the writer, so it is skipped
+        return [json.loads(line) for line in lines[:-1] if line.strip()]
+
+    def _append_journal(self, entries: List[Dict]):
+        self._drop_torn_tail()
+        data = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+        with open(self.journal_path, 'ab') as journal:
+            journal.write(data)
+            journal.flush()
+            os.fsync(journal.fileno())
+        self._journal_entries = (self._journal_entries or 0) + len(entries)
+
+    def _drop_torn_tail(self):
+        """Cut off an unterminated last line left by an interrupted append (call with the lock held)"""
+        try:
+            with open(self.journal_path, 'r+b') as journal:
+                size = journal.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                journal.seek(size - 1)
+                if journal.read(1) == b'\n':
+                    return
+                journal.seek(0)
+                journal.truncate(journal.read().rfind(b'\n') + 1)
+        except FileNotFoundError:
+            return
+
+    def _replay(self) -> pd.DataFrame:
+        """Return the main file with all journal entries applied (call with the lock held)"""
+        signature = self.signature()
+        df = self._read_file() if os.path.exists(self.path) else empty_transactions()
+        entries = self._read_journal()
+        self._journal_entries = len(entries)
+        journal_ids = [entry['row']['id'] for entry in entries if entry['op'] == 'insert']
+        if entries:
+            inserted = [entry['row'] for entry in entries if entry['op'] == 'insert']
+            deleted = {entry['id'] for entry in entries if entry['op'] == 'delete'}
+            updated = {entry['id']: entry['category'] for entry in entries if entry['op'] == 'update'}
+            replaced = {entry['row']['id']: entry['row'] for entry in entries if entry['op'] == 'replace'}
+            if inserted:
+                new_rows = pd.DataFrame(inserted)
+                new_rows['date'] = pd.to_datetime(new_rows['date'], format='ISO8601')
+                new_rows = coerce_transactions(new_rows)
+                # A compaction interrupted after the rename leaves inserts that
+                # are already in the main file behind; don't count them twice
+                if not df.empty:
+                    new_rows = new_rows[~new_rows['id'].isin(df['id'])]
+                df = new_rows if df.empty else pd.concat([df, new_rows], ignore_index=True)
+            if replaced:
+                df = df.copy()
+                for column in ('type', 'amount', 'description', 'category', 'date'):
+                    df[column] = df[column].astype(object)
+                for transaction_id, row in replaced.items():
+                    for column in ('type', 'amount', 'description', 'category'):
+                        df.loc[df['id'] == transaction_id, column] = row[column]
+                    df.loc[df['id'] == transaction_id, 'date'] = pd.Timestamp(row['date'])
+                df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+                df['date'] = pd.to_datetime(df['date'], errors='coerce')
+            if updated:
+                df = df.copy()
+                df['category'] = df['category'].astype(object)
+                for transaction_id, category in updated.items():
+                    df.loc[df['id'] == transaction_id, 'category'] = category
+            if deleted:
+                df = df[~df['id'].isin(deleted)]
+            df = df.sort_values('id').reset_index(drop=True)
+        # Hand-edited workbooks can have blank IDs; the tracker renumbers those rows
+        self._ids = set(int(i) for i in pd.to_numeric(df['id'], errors='coerce').dropna())
+        # Deletes are replayed by ID, so IDs inserted since the last compaction
+        # must not be handed out again even if their rows were deleted
+        self._next_id = max(self._ids.union(journal_ids), default=0) + 1
+        # Only now do the counters match the store; a failed read leaves them marked stale
+        self._counters_signature = signature
+        return df
+
+    def _sync_counters(self) -> tuple:
+        """Recompute the ID counters if another writer changed the store (call with the lock held)
+
+        Returns the store's signature, which the following write starts from.
+        """
+        self.last_write = None
+        signature = self.signature()
+        if self._next_id is None or self._counters_signature != signature:
+            self._replay()
+        return signature
+
+    def _wrote(self, before: tuple):
+        """Note that the counters reflect the store after our own write from ``before``"""
+        self._counters_signature = self.signature()
+        self.last_write = (before, self._counters_signature)
+
+    def load(self) -> pd.DataFrame:
+        with _file_lock(self.lock_path, shared=True):
+            return self._replay()
+
+    def compact_if_due(self):
+        if (self._journal_entries or 0) >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """Merge the journal into the main file"""
+        with _file_lock(self.lock_path):
+            self._replace_all(self._replay())
+
+    def replace_all(self, df: pd.DataFrame):
+        with _file_lock(self.lock_path):
+            self._replace_all(coerce_transactions(df))
+
+    def _replace_all(self, df: pd.DataFrame):
+        before = self.signature()
+        self._replace_file(df)
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self._journal_entries = 0
+        ids = pd.to_numeric(df['id'], errors='coerce').dropna()
+        self._ids = set(int(i) for i in ids)
+        self._next_id = max(self._ids) + 1 if self._ids else 1
+        self._wrote(before)
+
+    def insert(self, record: Dict) -> int:
+        return self.insert_many([record])[0]
+
+    @staticmethod
+    def _journal_row(transaction_id: int, record: Dict) -> Dict:
+        """Convert a transaction dict to a JSON-safe journal row"""
+        return {
+            'id': transaction_id,
+            'type': record['type'],
+            'amount': float(record['amount']),
+            'description': record.get('description'),
+            'category': record.get('category'),
+            'date': _iso_date(record.get('date')),
+        }
+
+    def insert_many(self, records: List[Dict]) -> List[int]:
+        with _file_lock(self.lock_path):
+            before = self._sync_counters()
+            entries = []
+            for record in records:
+                entries.append({'op': 'insert', 'row': self._journal_row(self._next_id, record)})
+                self._next_id += 1
+            self._append_journal(entries)
+            self._wrote(before)
+            new_ids = [entry['row']['id'] for entry in entries]
+            self._ids.update(new_ids)
+        return new_ids
+
+    def delete(self, transaction_id: int) -> bool:
+        transaction_id = int(transaction_id)
+        with _file_lock(self.lock_path):
+            before = self._sync_counters()
+            if transaction_id not in self._ids:
+                return False
+            self._append_journal([{'op': 'delete', 'id': transaction_id}])
+            self._wrote(before)
+            self._ids.discard(transaction_id)
+        return True
+
+    def update_category(self, transaction_id: int, category: str) -> bool:
+        transaction_id = int(transaction_id)
+        with _file_lock(self.lock_path):
+            before = self._sync_counters()
+            if transaction_id not in self._ids:
+                return False
+            self._append_journal([{'op': 'update', 'id': transaction_id, 'category': category}])
+            self._wrote(before)
+        return True
+
+    def update_rows(self, records: List[Dict]) -> int:
+        with _file_lock(self.lock_path):
+            before = self._sync_counters()
+            entries = [{'op': 'replace', 'row': self._journal_row(int(record['id']), record)}
+                       for record in records if int(record['id']) in self._ids]
+            if entries:
+                self._append_journal(entries)
+                self._wrote(before)
+        return len(entries)
+
+
+class ExcelStorage(FileStorage):
+    """Workbook store kept for spreadsheet users and import/export"""
+
+    def _read_file(self) -> pd.DataFrame:
+        return coerce_transactions(pd.read_excel(self.path))
+
+    def _write_file(self, df: pd.DataFrame, path: str):
+        # The store is rewritten on every compaction; styling is for exports only
+        write_excel(df, path, styled=False)
+
+
+class SQLiteStorage(StorageBackend):
+    """Embedded SQLite store with indexed single-row writes
+
+    A ``monthly_rollup`` table of (period, type, category) -> total, count,
+    largest is updated in the same transaction as every insert, delete and
+    category change, and rebuilt when the whole ledger is replaced. Amounts
+    are stored as integer centavos (``amount_centavos``), so the rollup
+    totals are exact sums that never drift; reads return pesos like the
+    other stores. When SQLite is built with FTS5, descriptions are indexed
+    the same way in ``transactions_fts`` for prefix search.
+    """
+
+    has_rollup = True
+    busy_timeout = 30
+
+    def __init__(self, path: str = 'budget_data.db'):
+        self.path = path
+        self.has_search = False
+        if self.exists():
+            self._create_schema()
+
+    @contextmanager
+    def _connect(self, write: bool = False):
+        """Open a connection that commits on success and always closes
+
+        With ``write`` the transaction takes SQLite's write lock up front
+        (BEGIN IMMEDIATE), so read-modify-write sequences such as the rollup
+        updates can't interleave with another writer. Waiting writers retry
+        for up to ``busy_timeout`` seconds.
+        """
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+        try:
+            with conn:
+                if write:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_schema(self):
+        with self._connect() as conn:
+            if 'amount' in self._transaction_columns(conn):
+                self._migrate_peso_amounts(conn)
+            conn.executescript(_TRANSACTIONS_TABLE.format(table='transactions') + """;
+                CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+                CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type);
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS monthly_rollup (
+                    period INTEGER NOT NULL,
+                    type TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    largest INTEGER NOT NULL,
+                    PRIMARY KEY (period, type, category)
+                )
+            """)
+            # Stores created before the rollup existed get it built once
+            has_rows = conn.execute("SELECT 1 FROM transactions LIMIT 1").fetchone()
+            has_rollup = conn.execute("SELECT 1 FROM monthly_rollup LIMIT 1").fetchone()
+            if has_rows and not has_rollup:
+                self._rebuild_rollup(conn)
+            try:
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(description)")
+            except sqlite3.OperationalError:
+                # No FTS5 in this SQLite build; search falls back to the in-memory index
+                self.has_search = False
+                return
+            self.has_search = True
+            # Reindex when rows were written without the index, e.g. by an
+            # instance opened before FTS5 was enabled on this database
+            indexed = conn.execute("SELECT COUNT(*) FROM transactions_fts").fetchone()[0]
+            stored = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+            if indexed != stored:
+                self._rebuild_search_index(conn)
+
+    @staticmethod
+    def _transaction_columns(conn) -> List[str]:
+        return [row[1] for row in conn.execute("PRAGMA table_info(transactions)")]
+
+    def _migrate_peso_amounts(self, conn):
+        """Rewrite a store that kept REAL peso amounts with integer centavos
+
+        Runs in one transaction. The monthly rollup, which held totals of
+        those amounts, is dropped to be rebuilt from the new column.
+        """
+        conn.execute("BEGIN IMMEDIATE")
+        if 'amount' not in self._transaction_columns(conn):
+            # Another process migrated it while we waited for the lock
+            conn.commit()
+            return
+        rows = conn.execute("SELECT id, type, amount, description, category, date FROM transactions").fetchall()
+        # Unreadable amounts become 0, as the tracker's integrity check would repair them
+        centavos = to_centavos([row[2] for row in rows]).fillna(0).tolist()
+        sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'").fetchone()
+        conn.execute(_TRANSACTIONS_TABLE.format(table='transactions_centavos'))
+        conn.executemany(
+            "INSERT INTO transactions_centavos (id, type, amount_centavos, description, category, date) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(row[0], row[1], int(amount), row[3], row[4], row[5]) for row, amount in zip(rows, centavos)]
+        )
+        conn.execute("DROP TABLE transactions")
+        conn.execute("ALTER TABLE transactions_centavos RENAME TO transactions")
+        if sequence is not None:
+            # Keep AUTOINCREMENT from reusing IDs deleted before the migration
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'transactions'", sequence)
+        conn.execute("DROP TABLE IF EXISTS monthly_rollup")
+        conn.commit()
+
+    def _rebuild_search_index(self, conn):
+        """Reindex every transaction description"""
+        if not self.has_search:
+            return
+        conn.execute("DELETE FROM transactions_fts")
+        conn.execute("INSERT INTO transactions_fts (rowid, description) "
+                     "SELECT id, COALESCE(description, '') FROM transactions")
+
+    @staticmethod
+    def _rebuild_rollup(conn):
+        """Recompute the monthly rollup from every transaction"""
+        conn.execute("DELETE FROM monthly_rollup")
+        conn.execute(f"""
+            INSERT INTO monthly_rollup (period, type, category, total, count, largest)
+            SELECT {_SQL_PERIOD}, type, COALESCE(category, ''), SUM(amount_centavos), COUNT(*),
+                   MAX(amount_centavos)
+            FROM transactions GROUP BY 1, 2, 3
+        """)
+
+    @staticmethod
+    def _rollup_add(conn, row: tuple):
+        """Count one (type, centavos, description, category, date) row into the rollup"""
+        transaction_type, amount, _, category, date_text = row
+        conn.execute(
+            "INSERT INTO monthly_rollup (period, type, category, total, count, largest) "
+            "VALUES (?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT (period, type, category) DO UPDATE SET "
+            "total = total + excluded.total, count = count + 1, largest = MAX(largest, excluded.largest)",
+            (_period_of(date_text), transaction_type, category or '', amount, amount)
+        )
+
+    @staticmethod
+    def _rollup_remove(conn, row: tuple):
+        """Take one (type, centavos, category, date) row back out of the rollup"""
+        transaction_type, amount, category, date_text = row
+        key = (_period_of(date_text), transaction_type, category or '')
+        conn.execute("UPDATE monthly_rollup SET total = total - ?, count = count - 1 "
+                     "WHERE period = ? AND type = ? AND category = ?", (amount,) + key)
+        conn.execute("DELETE FROM monthly_rollup WHERE period = ? AND type = ? AND category = ? AND count <= 0", key)
+        # The maximum can't be decremented; re-read it from the month's rows if we removed it
+        month_start, month_end = _period_bounds(key[0])
+        conn.execute(
+            "UPDATE monthly_rollup SET largest = ("
+            "  SELECT MAX(amount_centavos) FROM transactions"
+            "  WHERE date >= ? AND date < ? AND type = ? AND COALESCE(category, '') = ?"
+            ") WHERE period = ? AND type = ? AND category = ? AND largest <= ?",
+            (month_start, month_end, transaction_type, key[2]) + key + (amount,)
+        )
+
+    def create(self):
+        self._create_schema()
+
+    def signature(self) -> tuple:
+        # The header's file change counter is bumped by every committed write,
+        # which catches same-size rewrites that mtime granularity could miss
+        try:
+            with open(self.path, 'rb') as db:
+                db.seek(24)
+                change_counter = int.from_bytes(db.read(4), 'big')
+        except OSError:
+            change_counter = None
+        return _file_signature(self.path) + (change_counter,)
+
+    @staticmethod
+    def _to_row(record: Dict) -> tuple:
+        """Convert a transaction dict to a tuple in column order (without ID), amount in centavos"""
+        return (
+            str(record['type']),
+            amount_to_centavos(record['amount']),
+            None if pd.isna(record.get('description')) else str(record.get('description')),
+            None if pd.isna(record.get('category')) else str(record.get('category')),
+            _iso_date(record.get('date')),
+        )
+
+    def load(self) -> pd.DataFrame:
+        if not self.exists():
+            return empty_transactions()
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                f"SELECT {_SQL_COLUMNS} FROM transactions ORDER BY id",
+                conn
+            )
+        if len(df) > 0:
+            df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+        return df
+
+    def replace_all(self, df: pd.DataFrame):
+        df = coerce_transactions(df)
+        self._create_schema()
+        with self._connect(write=True) as conn:
+            conn.execute("DELETE FROM transactions")
+            conn.executemany(
+                "INSERT INTO transactions (id, type, amount_centavos, description, category, date) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(int(record['id']),) + self._to_row(record) for record in df.to_dict('records')]
+            )
+            self._rebuild_rollup(conn)
+            self._rebuild_search_index(conn)
+
+    def insert(self, record: Dict) -> int:
+        return self.insert_many([record])[0]
+
+    def insert_many(self, records: List[Dict]) -> List[int]:
+        new_ids = []
+        with self._connect(write=True) as conn:
+            for record in records:
+                row = self._to_row(record)
+                cursor = conn.execute(
+                    "INSERT INTO transactions (type, amount_centavos, description, category, date) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    row
+                )
+                new_ids.append(int(cursor.lastrowid))
+                self._rollup_add(conn, row)
+                if self.has_search:
+                    conn.execute("INSERT INTO transactions_fts (rowid, description) VALUES (?, ?)",
+                                 (new_ids[-1], row[2] or ''))
+        return new_ids
+
+    def delete(self, transaction_id: int) -> bool:
+        if not self.exists():
+            return False
+        with self._connect(write=True) as conn:
+            old = conn.execute("SELECT type, amount_centavos, category, date FROM transactions WHERE id = ?",
+                               (int(transaction_id),)).fetchone()
+            if old is None:
+                return False
+            conn.execute("DELETE FROM transactions WHERE id = ?", (int(transaction_id),))
+            self._rollup_remove(conn, old)
+            if self.has_search:
+                conn.execute("DELETE FROM transactions_fts WHERE rowid = ?", (int(transaction_id),))
+            return True
+
+    def update_category(self, transaction_id: int, category: str) -> bool:
+        if not self.exists():
+            return False
+        with self._connect(write=True) as conn:
+            old = conn.execute("SELECT type, amount_centavos, category, date FROM transactions WHERE id = ?",
+                               (int(transaction_id),)).fetchone()
+            if old is None:
+                return False
+            conn.execute("UPDATE transactions SET category = ? WHERE id = ?", (category, int(transaction_id)))
+            transaction_type, amount, _, date_text = old
+            self._rollup_remove(conn, old)
+            self._rollup_add(conn, (transaction_type, amount, None, category, date_text))
+            return True
+
+    def update_rows(self, records: List[Dict]) -> int:
+        if not self.exists():
+            return 0
+        updated = 0
+        with self._connect(write=True) as conn:
+            for record in records:
+                transaction_id = int(record['id'])
+                row = self._to_row(record)
+                cursor = conn.execute("UPDATE transactions SET type = ?, amount_centavos = ?, description = ?, "
+                                      "category = ?, date = ? WHERE id = ?", row + (transaction_id,))
+                if cursor.rowcount == 0:
+                    continue
+                updated += 1
+                if self.has_search:
+                    conn.execute("DELETE FROM transactions_fts WHERE rowid = ?", (transaction_id,))
+                    conn.execute("INSERT INTO transactions_fts (rowid, description) VALUES (?, ?)",
+                                 (transaction_id, row[2] or ''))
+            # Rewritten rows may have had unparseable dates or amounts that the
+            # rollup can't take back out one by one; regroup once instead
+            if updated:
+                self._rebuild_rollup(conn)
+        return updated
+
+    def monthly_rollup(self) -> pd.DataFrame:
+        if not self.exists():
+            return pd.DataFrame(columns=ROLLUP_COLUMNS)
+        with self._connect() as conn:
+            rollup = pd.read_sql_query(
+                "SELECT type, period, category, total, count, largest FROM monthly_rollup",
+                conn
+            )
+        # Missing categories are stored as '' to keep the primary key usable
+        rollup['category'] = rollup['category'].mask(rollup['category'] == '')
+        return rollup
+
+    def search(self, query: str) -> List[int]:
+        if not self.has_search:
+            raise NotImplementedError("This SQLite build has no FTS5 search")
+        tokens = search_tokens(query)
+        if not tokens:
+            return []
+        # Every token must match, each as a quoted prefix so FTS syntax can't leak in
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        with self._connect() as conn:
+            rows = conn.execute("SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?",
+                                (match,)).fetchall()
+        return sorted(row[0] for row in rows)
+
+    def get(self, transaction_id: int) -> Optional[pd.Series]:
+        if not self.exists():
+            return None
+        with self._connect() as conn:
+            df = pd.read_sql_query(
+                f"SELECT {_SQL_COLUMNS} FROM transactions WHERE id = ?",
+                conn, params=(int(transaction_id),)
+            )
+        if df.empty:
+            return None
+        df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+        return df.iloc[0]
+
+
+# SQL expression turning an ISO date column into year * 100 + month
+_SQL_PERIOD = "CAST(substr(date, 1, 4) || substr(date, 6, 2) AS INTEGER)"
+
+# Transaction table of SQLiteStorage; amounts are whole centavos
+_TRANSACTIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        type TEXT NOT NULL,
+        amount_centavos INTEGER NOT NULL,
+        description TEXT,
+        category TEXT,
+        date TEXT NOT NULL
+    )
+"""
+
+# Columns read back from SQLiteStorage, with the amount in pesos like the other stores
+_SQL_COLUMNS = f"id, type, amount_centavos / {CENTAVOS_PER_PESO}.0 AS amount, description, category, date"
+
+
+def _period_of(date_text: str) -> int:
+    """Return year * 100 + month for ISO date text"""
+    return int(date_text[:4] + date_text[5:7])
+
+
+def _period_bounds(period: int) -> tuple:
+    """Return the [start, end) ISO date strings of a year * 100 + month period"""
+    year, month = divmod(period, 100)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01", f"{next_year:04d}-{next_month:02d}-01"
+
+
+class CSVStorage(FileStorage):
+    """Plain-text store that parses far faster than a workbook"""
+
+    def _read_file(self) -> pd.DataFrame:
+        df = pd.read_csv(self.path, dtype={'type': str, 'description': str, 'category': str})
+        if len(df) > 0:
+            df['date'] = pd.to_datetime(df['date'], format='ISO8601', errors='coerce')
+        return coerce_transactions(df)
+
+    def _write_file(self, df: pd.DataFrame, path: str):
+        df.to_csv(path, index=False)
+
+
+class ParquetStorage(FileStorage):
+    """Columnar store with typed id, amount and date columns (needs pyarrow)"""
+
+    def _read_file(self) -> pd.DataFrame:
+        return coerce_transactions(pd.read_parquet(self.path))
+
+    def _write_file(self, df: pd.DataFrame, path: str):
+        df = df.copy()
+        if len(df) > 0:
+            df['id'] = df['id'].astype('int64')
+            df['amount'] = df['amount'].astype('float64')
+        # Text columns that are entirely missing would otherwise be stored as nulls of no type
+        for column in ('type', 'description', 'category'):
+            df[column] = df[column].astype(object).where(df[column].notna(), None)
+        df.to_parquet(path, index=False)
+
+
+@contextmanager
+def _file_lock(path: str, shared: bool = False):
+    """Hold an advisory lock on the file at ``path`` across threads and processes
+
+    Shared locks let readers overlap on POSIX; Windows only has exclusive
+    locks, so there readers take turns too.
+    """
+    with open(path, 'a+b') as lock_file:
+        if os.name == 'nt':
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gives up after ten one-second retries; keep waiting
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _file_signature(path: str) -> tuple:
+    """Return (mtime_ns, size) of a file, or (None, None) if it is missing"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (None, None)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _iso_date(value) -> str:
+    """Format a date as sortable ISO text, dropping a midnight time component"""
+    timestamp = pd.Timestamp(value) if value is not None and not pd.isna(value) else pd.Timestamp.now()
+    if timestamp == timestamp.normalize():
+        return timestamp.strftime('%Y-%m-%d')
+    return timestamp.strftime('%Y-%m-%d %H:%M:%S')
+
+
+# Column widths of the styled ledger sheet, in ledger column order
+EXCEL_COLUMN_WIDTHS = {'A': 8, 'B': 12, 'C': 15, 'D': 30, 'E': 15, 'F': 12}
+
+
+def write_excel(df: pd.DataFrame, path, styled: bool = True, sheet_name: str = 'Transactions'):
+    """Write a ledger to an Excel workbook (a path or binary file object)
+
+    With ``styled`` the header row is formatted, columns are sized, and the
+    header is frozen with an auto-filter, all before the workbook is first
+    saved, so it is serialized once. Internal saves pass ``styled=False``.
+    """
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name=sheet_name)
+        if styled:
+            _style_ledger_sheet(writer.sheets[sheet_name], len(df.columns))
+
+
+def _style_ledger_sheet(worksheet, column_count: int):
+    """Format the header row and column widths of a ledger worksheet in place"""
+    from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+    from openpyxl.utils import get_column_letter
+
+    header_font = Font(bold=True, size=12, color='FFFFFF')
+    header_fill = PatternFill(start_color='366092', end_color='366092', fill_type='solid')
+    header_alignment = Alignment(horizontal='center', vertical='center')
+
+    border = Border(
+        left=Side(style='thin'),
+        right=Side(style='thin'),
+        top=Side(style='thin'),
+        bottom=Side(style='thin')
+    )
+
+    # Format header row
+    for col_idx in range(1, column_count + 1):
+        cell = worksheet.cell(row=1, column=col_idx)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.alignment = header_alignment
+        cell.border = border
+
+    # Set column widths
+    for column, width in EXCEL_COLUMN_WIDTHS.items():
+        worksheet.column_dimensions[column].width = width
+
+    worksheet.row_dimensions[1].height = 20
+    if column_count:
+        worksheet.auto_filter.ref = f"A1:{get_column_letter(column_count)}1"
+    worksheet.freeze_panes = "A2"
+
+
+def open_storage(path: str) -> StorageBackend:
+    """Pick a storage backend from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.db', '.sqlite', '.sqlite3'):
+        return SQLiteStorage(path)
+    if extension in ('.parquet', '.pq'):
+        return ParquetStorage(path)
+    if extension == '.csv':
+        return CSVStorage(path)
+    if extension in ('.xlsx', '.xls'):
+        return ExcelStorage(path)
+    raise ValueError(f"Unsupported storage format: {extension or path}")
+
+
+def migrate_excel_ledger(excel_file: str, store_file: str) -> int:
+    """One-shot import of an existing Excel ledger into a new store
+
+    The target backend is picked from ``store_file``'s extension as in
+    ``open_storage`` (SQLite by default, or Parquet/CSV). Returns the
+    number of migrated transactions. The Excel file is left untouched so
+    it can serve as a backup.
+    """
+    if os.path.exists(store_file):
+        raise FileExistsError(f"{store_file} already exists; refusing to overwrite it")
+
+    df = ExcelStorage(excel_file).load()
+    if len(df) > 0:
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').fillna(0)
+        # Legacy workbooks can carry blank or float IDs; renumber those rows
+        ids = pd.to_numeric(df['id'], errors='coerce')
+        if ids.isna().any() or ids.duplicated().any():
+            ids = pd.Series(range(1, len(df) + 1), index=df.index)
+        df['id'] = ids.astype(int)
+
+    target = open_storage(store_file)
+    target.replace_all(df)
+    return len(df)
+
+
+# Name from when SQLite was the only migration target
+migrate_excel_to_sqlite = migrate_excel_ledger
@@ -2,6 +2,9 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date
 from budget_tracker_web import BudgetTrackerWeb
+from categorizer import EXPENSE_CATEGORIES
+from importer import TransactionFileReader
+from storage import CENTAVOS_PER_PESO, to_pesos, write_excel
 import os
 from io import BytesIO
 
@@ -16,10 +19,20 @@ st.set_page_config(
 # Initialize the budget tracker
 @st.cache_resource
 def get_tracker():
-    return BudgetTrackerWeb()
+    tracker = BudgetTrackerWeb()
+    # Pick up expenses a previous run left waiting for the LLM
+    tracker.resume_pending_categorization()
+    return tracker
 
 tracker = get_tracker()
 
+
+def format_pesos(centavos) -> str:
+    """Format a centavo amount from the tracker as pesos, e.g. ₱1,234.50"""
+    pesos, cents = divmod(abs(int(centavos)), CENTAVOS_PER_PESO)
+    return f"₱{'-' if centavos < 0 else ''}{pesos:,}.{cents:02d}"
+
+
 # Custom CSS with Dark Mode Support
 st.markdown("""
 <style>
@@ -246,20 +259,32 @@ st.sidebar.markdown("---")
 st.sidebar.markdown("### 🔑 AI Features Status")
 api_key = os.getenv('OPENAI_API_KEY')
 if api_key:
-    # Test API key validity
+    # Only shows the last check made by an AI request; rendering never calls the API
     if tracker.client:
-        is_valid, message = tracker._validate_api_key()
-        if is_valid:
+        status = tracker.api_key_status
+        if status is None:
+            st.sidebar.info("🔑 API key not checked yet")
+            st.sidebar.caption("It is checked on the first AI request")
+        elif status[0]:
             st.sidebar.success("✅ AI features enabled")
         else:
             st.sidebar.error("❌ Invalid API key")
-            st.sidebar.caption(message)
+            st.sidebar.caption(status[1])
     else:
         st.sidebar.error("❌ API client error")
 else:
     st.sidebar.warning("⚠️ AI features disabled")
     st.sidebar.caption("Set OPENAI_API_KEY to enable")
 
+pending_categories = tracker.categorization_queue.pending_count()
+if pending_categories:
+    st.sidebar.caption(f"⏳ {pending_categories} expense(s) awaiting AI categorization")
+
+cache_stats = tracker.category_cache.stats()
+if cache_stats['size'] > 0:
+    st.sidebar.caption(f"🏷️ {cache_stats['size']:,} remembered categories "
+                       f"({cache_stats['hit_rate']:.0%} cache hit rate)")
+
 # Determine which page to show based on button clicks or session state
 if 'current_page' not in st.session_state:
     if tracker.is_first_time_user():
@@ -375,14 +400,7 @@ if page == "Setup":
             {'type': 'expense', 'amount': 1500, 'description': 'Coffee & Dining', 'category': 'Food', 'date': datetime.now().date()}
         ]
         
-        for transaction in sample_transactions:
-            tracker.add_transaction(
-                transaction['type'],
-                transaction['amount'],
-                transaction['description'],
-                transaction['category'],
-                transaction['date']
-            )
+        tracker.add_transactions(sample_transactions)
         
         st.success("✅ Sample data added! You can now explore all features.")
         st.rerun()
@@ -406,13 +424,13 @@ elif page == "Dashboard":
     col1, col2 = st.columns(2)
     
     with col1:
-        st.metric("💰 Current Balance", f"₱{overview['total_balance']:,.2f}")
-        st.metric("📈 Total Income", f"₱{overview['total_income']:,.2f}")
+        st.metric("💰 Current Balance", format_pesos(overview['total_balance']))
+        st.metric("📈 Total Income", format_pesos(overview['total_income']))
         st.metric("📊 Transaction Count", f"{overview['transaction_count']:,}")
     
     with col2:
-        st.metric("📉 Total Expenses", f"₱{overview['total_expenses']:,.2f}")
-        st.metric("🏆 Largest Expense", f"₱{overview['largest_expense']:,.2f}")
+        st.metric("📉 Total Expenses", format_pesos(overview['total_expenses']))
+        st.metric("🏆 Largest Expense", format_pesos(overview['largest_expense']))
         st.metric("🔄 Most Frequent Category", overview['most_frequent_category'])
     
     # Additional metrics for monthly view
@@ -420,9 +438,9 @@ elif page == "Dashboard":
         st.markdown("### 📊 Average Monthly Overview")
         col3, col4 = st.columns(2)
         with col3:
-            st.metric("📈 Avg Monthly Income", f"₱{overview['avg_monthly_income']:,.2f}")
+            st.metric("📈 Avg Monthly Income", format_pesos(overview['avg_monthly_income']))
         with col4:
-            st.metric("📉 Avg Monthly Expenses", f"₱{overview['avg_monthly_expenses']:,.2f}")
+            st.metric("📉 Avg Monthly Expenses", format_pesos(overview['avg_monthly_expenses']))
     
     # Show date range
     if overview['date_range'] != 'No data':
@@ -451,7 +469,7 @@ elif page == "Dashboard":
             st.plotly_chart(comprehensive_chart, use_container_width=True)
         
         st.subheader("💹 Balance History")
-        balance_chart = tracker.create_balance_chart(df)
+        balance_chart = tracker.create_balance_chart(df, freq='D')
         if balance_chart:
             st.plotly_chart(balance_chart, use_container_width=True)
         
@@ -465,13 +483,13 @@ elif page == "Dashboard":
             recent_df = df.tail(display_count).sort_values('date', ascending=False)
             
             for idx, transaction in recent_df.iterrows():
-                with st.expander(f"ID: {transaction['id']} - {transaction['description']} - ₱{transaction['amount']:,.2f}"):
+                with st.expander(f"ID: {transaction['id']} - {transaction['description']} - {format_pesos(transaction['amount'])}"):
                     col1, col2 = st.columns([3, 1])
                     
                     with col1:
                         st.write(f"**📅 Date:** {transaction['date'].strftime('%Y-%m-%d') if hasattr(transaction['date'], 'strftime') else transaction['date']}")
                         st.write(f"**💼 Type:** {transaction['type'].title()}")
-                        st.write(f"**💰 Amount:** ₱{transaction['amount']:,.2f}")
+                        st.write(f"**💰 Amount:** {format_pesos(transaction['amount'])}")
                         st.write(f"**🏷️ Category:** {transaction['category']}")
                         st.write(f"**📝 Description:** {transaction['description'][:50]}{'...' if len(str(transaction['description'])) > 50 else ''}")
                     
@@ -504,8 +522,7 @@ elif page == "Add Transaction":
         if transaction_type == "expense":
             category = st.selectbox(
                 "Category (leave blank for AI categorization)", 
-                ["", "Food", "Transportation", "Entertainment", "Healthcare", 
-                 "Shopping", "Utilities", "Housing", "Education", "Other"]
+                [""] + EXPENSE_CATEGORIES
             )
         elif transaction_type == "savings":
             category = st.selectbox(
@@ -525,7 +542,7 @@ elif page == "Add Transaction":
             if amount > 0 and description:
                 try:
                     # Add the transaction
-                    updated_df = tracker.add_transaction(
+                    tracker.add_transaction(
                         transaction_type, amount, description, 
                         category if category else None, transaction_date
                     )
@@ -583,59 +600,69 @@ elif page == "Data Management":
         st.info(f"📅 Currently viewing: **{data_view}** transactions")
         
         if not df.empty:
+            search_text = st.text_input("🔍 Search descriptions", placeholder="e.g. groc")
+            
             # Filters
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                type_filter = st.selectbox("Filter by type", ["All", "income", "expense"])
+                type_filter = st.selectbox("Filter by type", ["All", "income", "expense", "savings"])
             
             with col2:
-                if not df.empty:
-                    categories = ["All"] + sorted(df['category'].unique().tolist())
-                    category_filter = st.selectbox("Filter by category", categories)
-                else:
-                    category_filter = "All"
+                categories = ["All"] + sorted(df['category'].dropna().unique().tolist())
+                category_filter = st.selectbox("Filter by category", categories)
             
             with col3:
-                if not df.empty:
-                    date_range = st.date_input(
-                        "Date range",
-                        value=(df['date'].min().date(), df['date'].max().date()),
-                        min_value=df['date'].min().date(),
-                        max_value=df['date'].max().date()
-                    )
-                else:
-                    date_range = (date.today(), date.today())
+                date_range = st.date_input(
+                    "Date range",
+                    value=(df['date'].min().date(), df['date'].max().date()),
+                    min_value=df['date'].min().date(),
+                    max_value=df['date'].max().date()
+                )
             
-            # Apply filters
-            filtered_df = df.copy()
+            col1, col2, col3 = st.columns(3)
             
-            if type_filter != "All":
-                filtered_df = filtered_df[filtered_df['type'] == type_filter]
+            with col1:
+                sort_options = {"Newest first": ('date', True), "Oldest first": ('date', False),
+                                "Largest amount": ('amount', True), "Smallest amount": ('amount', False)}
+                sort_by, descending = sort_options[st.selectbox("Sort by", list(sort_options))]
+            
+            with col2:
+                page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
             
-            if category_filter != "All":
-                filtered_df = filtered_df[filtered_df['category'] == category_filter]
+            with col3:
+                page_number = st.number_input("Page", min_value=1, value=1, step=1)
             
-            if len(date_range) == 2:
-                start_date, end_date = date_range
-                filtered_df = filtered_df[
-                    (filtered_df['date'].dt.date >= start_date) & 
-                    (filtered_df['date'].dt.date <= end_date)
-                ]
+            # Filter and page on the tracker; only the visible page is copied
+            start_date, end_date = date_range if len(date_range) == 2 else (None, None)
+            result = tracker.query_transactions(
+                transaction_type=None if type_filter == "All" else type_filter,
+                category=None if category_filter == "All" else category_filter,
+                date_filter=date_filter_map.get(data_view),
+                start_date=start_date,
+                end_date=end_date,
+                search=search_text,
+                page=int(page_number),
+                page_size=page_size,
+                sort_by=sort_by,
+                descending=descending
+            )
             
             # Display filtered data
-            if not filtered_df.empty:
-                display_df = filtered_df.copy()
-                display_df['amount'] = display_df['amount'].apply(lambda x: f"₱{x:,.2f}")
-                display_df['date'] = display_df['date'].dt.strftime('%Y-%m-%d')
-                
-                # Truncate long descriptions for better display
-                display_df['description'] = display_df['description'].apply(
-                    lambda x: str(x)[:30] + '...' if len(str(x)) > 30 else str(x)
-                )
+            if result['total_rows'] > 0:
+                page_df = result['rows']
+                display_df = pd.DataFrame({
+                    'date': page_df['date'].dt.strftime('%Y-%m-%d'),
+                    'type': page_df['type'],
+                    'amount': [format_pesos(amount) for amount in page_df['amount']],
+                    # Truncate long descriptions for better display
+                    'description': [text if len(text) <= 30 else text[:30] + '...'
+                                    for text in page_df['description'].astype(str)],
+                    'category': page_df['category']
+                })
                 
                 st.dataframe(
-                    display_df[['date', 'type', 'amount', 'description', 'category']],
+                    display_df,
                     use_container_width=True,
                     hide_index=True,
                     column_config={
@@ -646,21 +673,22 @@ elif page == "Data Management":
                         "category": st.column_config.TextColumn("Category", width="medium")
                     }
                 )
+                st.caption(f"Page {result['page']} of {result['page_count']}")
                 
                 # Summary statistics
                 st.subheader("📊 Summary Statistics")
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
-                    st.metric("Total Transactions", len(filtered_df))
+                    st.metric("Total Transactions", result['total_rows'])
                 
                 with col2:
-                    income_total = filtered_df[filtered_df['type'] == 'income']['amount'].sum()
-                    st.metric("Total Income", f"₱{income_total:,.2f}")
+                    income_total = result['totals'].get('income', 0)
+                    st.metric("Total Income", format_pesos(income_total))
                 
                 with col3:
-                    expense_total = filtered_df[filtered_df['type'] == 'expense']['amount'].sum()
-                    st.metric("Total Expenses", f"₱{expense_total:,.2f}")
+                    expense_total = result['totals'].get('expense', 0)
+                    st.metric("Total Expenses", format_pesos(expense_total))
             
             else:
                 st.info(f"No transactions match the selected filters for {data_view}.")
@@ -668,35 +696,55 @@ elif page == "Data Management":
             st.info(f"No transactions found for {data_view}. Try a different time period or add some transactions.")
     
     with tab2:
-        st.subheader("📤 Upload Data from Excel")
+        st.subheader("📤 Upload Data from Excel or CSV")
         
-        uploaded_file = st.file_uploader("Choose an Excel file", type=['xlsx', 'xls'])
+        uploaded_file = st.file_uploader("Choose an Excel or CSV file", type=['xlsx', 'xls', 'csv'])
         
         if uploaded_file is not None:
             try:
-                # Read the uploaded file
-                upload_df = pd.read_excel(uploaded_file)
+                # Only the header and the first rows are read for the preview
+                reader = TransactionFileReader(uploaded_file, uploaded_file.name)
                 
                 # Display preview
                 st.write("Preview of uploaded data:")
-                st.dataframe(upload_df.head())
+                st.dataframe(reader.preview())
                 
                 # Validate required columns
-                required_columns = ['type', 'amount', 'description', 'category', 'date']
-                missing_columns = [col for col in required_columns if col not in upload_df.columns]
+                missing_columns = reader.missing_columns()
                 
                 if missing_columns:
                     st.error(f"Missing required columns: {', '.join(missing_columns)}")
                     st.write("Required columns: type, amount, description, category, date")
                 else:
+                    import_modes = {
+                        "Skip duplicates": 'skip_duplicates',
+                        "Update categories of duplicates": 'upsert',
+                        "Append everything": 'append'
+                    }
+                    import_mode = st.radio("Rows already in your ledger", list(import_modes), horizontal=True)
+                    
                     if st.button("Import Data"):
-                        # Process and save the data
-                        upload_df['date'] = pd.to_datetime(upload_df['date'])
-                        upload_df['id'] = range(1, len(upload_df) + 1)
+                        progress_bar = st.progress(0.0, text="Importing...")
                         
-                        tracker.save_data(upload_df)
-                        st.success("✅ Data imported successfully!")
-                        st.rerun()
+                        def show_progress(rows_read, total_rows):
+                            if total_rows:
+                                progress_bar.progress(min(rows_read / total_rows, 1.0),
+                                                      text=f"Imported {rows_read:,} of {total_rows:,} rows")
+                            else:
+                                progress_bar.progress(0.0, text=f"Imported {rows_read:,} rows")
+                        
+                        # Rows are validated, categorized and appended in batches
+                        try:
+                            result = tracker.import_file(uploaded_file, uploaded_file.name,
+                                                         mode=import_modes[import_mode], progress=show_progress)
+                        except ValueError as e:
+                            st.error(f"❌ Import rejected: {str(e)}")
+                        else:
+                            progress_bar.progress(1.0, text="Import complete")
+                            st.success(f"✅ Imported {result['imported']} transactions, updated {result['updated']}, "
+                                       f"skipped {result['duplicates']} duplicates")
+                            if result['invalid']:
+                                st.warning(f"⚠️ Skipped {result['invalid']} invalid rows: {'; '.join(result['errors'])}")
             
             except Exception as e:
                 st.error(f"❌ Error reading file: {str(e)}")
@@ -707,12 +755,12 @@ elif page == "Data Management":
         if not df.empty:
             # Prepare download data
             download_df = df.copy()
+            download_df['amount'] = to_pesos(download_df['amount'])
             download_df['date'] = download_df['date'].dt.strftime('%Y-%m-%d')
             
-            # Convert to Excel bytes
+            # Convert to formatted Excel bytes in one pass
             output = BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                download_df.to_excel(writer, index=False, sheet_name='Transactions')
+            write_excel(download_df, output)
             
             excel_data = output.getvalue()
             
@@ -774,12 +822,12 @@ elif page == "Savings Tracker":
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("💰 Period Savings", f"₱{total_savings:,.2f}")
-            st.metric("🏦 Total All-Time Savings", f"₱{all_total_savings:,.2f}")
+            st.metric("💰 Period Savings", format_pesos(total_savings))
+            st.metric("🏦 Total All-Time Savings", format_pesos(all_total_savings))
         
         with col2:
             largest_saving = savings_df['amount'].max()
-            st.metric("🏆 Largest Deposit", f"₱{largest_saving:,.2f}")
+            st.metric("🏆 Largest Deposit", format_pesos(largest_saving))
             transaction_count = len(savings_df)
             st.metric("📊 Deposits Count", f"{transaction_count:,}")
         
@@ -788,7 +836,7 @@ elif page == "Savings Tracker":
             profile = tracker.load_user_profile()
             savings_goal = profile.get('savings_goal', 0)
             if savings_goal > 0:
-                progress = min(100, (all_total_savings / savings_goal) * 100)
+                progress = min(100, (to_pesos(all_total_savings) / savings_goal) * 100)
                 st.metric("🎯 Goal Progress", f"{progress:.1f}%")
                 st.progress(progress / 100)
             else:
@@ -817,10 +865,10 @@ elif page == "Savings Tracker":
         recent_savings = savings_df.tail(10).sort_values('date', ascending=False)
         
         for idx, saving in recent_savings.iterrows():
-            with st.expander(f"₱{saving['amount']:,.2f} - {saving['description']} ({saving['date'].strftime('%Y-%m-%d')})"):
+            with st.expander(f"{format_pesos(saving['amount'])} - {saving['description']} ({saving['date'].strftime('%Y-%m-%d')})"):
                 col1, col2 = st.columns([3, 1])
                 with col1:
-                    st.write(f"**💰 Amount:** ₱{saving['amount']:,.2f}")
+                    st.write(f"**💰 Amount:** {format_pesos(saving['amount'])}")
                     st.write(f"**🏷️ Category:** {saving['category']}")
                     st.write(f"**📅 Date:** {saving['date'].strftime('%Y-%m-%d')}")
                     st.write(f"**📝 Description:** {saving['description']}")
@@ -844,7 +892,7 @@ with col1:
 
 with col2:
     st.markdown("**🔧 Features:**")
-    st.markdown("• Excel-based database storage")
+    st.markdown("• SQLite storage with Excel import/export")
     st.markdown("• AI-powered expense categorization")
     st.markdown("• Interactive charts and analytics")
 
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Hammer one shared tracker with concurrent adds, deletes and reads
+
+Mimics many Streamlit sessions sharing the cached tracker: a thread pool
+adds and deletes transactions while other threads keep reading the
+ledger. Afterwards the store must hold exactly the transactions that were
+added and not deleted, with no duplicated IDs.
+
+Usage: python stress_test.py [store extension, e.g. .db, .csv, .xlsx] [workers] [operations]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from budget_tracker import BudgetTracker
+
+
+def run_session(tracker: BudgetTracker, session: int, operations: int) -> tuple:
+    """Add transactions and delete some of them again; return (added IDs, deleted IDs)"""
+    added, deleted = [], []
+    for number in range(operations):
+        transaction_id = tracker.add_transaction('expense', random.randint(1, 500),
+                                                 f"session {session} item {number}", 'Food')
+        added.append(transaction_id)
+        if random.random() < 0.3:
+            victim = added[random.randrange(len(added))]
+            if victim not in deleted:
+                tracker.delete_transaction(victim)
+                deleted.append(victim)
+    return added, deleted
+
+
+def stress(extension: str, workers: int, operations: int) -> tuple:
+    """Run the sessions and readers; return (added IDs, deleted IDs, problems)"""
+    tracker = BudgetTracker(storage_uri='stress' + extension)
+
+    stop_reading = threading.Event()
+    read_errors = []
+
+    def keep_reading():
+        while not stop_reading.is_set():
+            try:
+                df = tracker.load_data()
+                if df['id'].duplicated().any():
+                    read_errors.append("reader saw duplicated IDs")
+                tracker.query_transactions(search='item', page_size=10)
+            except Exception as e:
+                read_errors.append(str(e))
+
+    readers = [threading.Thread(target=keep_reading) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda session: run_session(tracker, session, operations),
+                                range(workers)))
+    stop_reading.set()
+    for reader in readers:
+        reader.join()
+
+    added = [transaction_id for ids, _ in results for transaction_id in ids]
+    deleted = {transaction_id for _, ids in results for transaction_id in ids}
+    expected = set(added) - deleted
+    stored = tracker.load_data()['id'].tolist()
+
+    problems = list(read_errors[:5])
+    if len(added) != len(set(added)):
+        problems.append(f"{len(added) - len(set(added))} IDs were handed out twice")
+    if len(stored) != len(set(stored)):
+        problems.append("the store holds duplicated IDs")
+    if set(stored) != expected:
+        problems.append(f"store has {len(stored)} rows, expected {len(expected)}")
+
+    return added, deleted, problems
+
+
+def main():
+    """Run the stress test and exit non-zero if the ledger is inconsistent"""
+    extension = sys.argv[1] if len(sys.argv) > 1 else '.db'
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    operations = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    original_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        # The tracker keeps its profile and category cache in the working directory
+        os.chdir(directory)
+        try:
+            added, deleted, problems = stress(extension, workers, operations)
+        finally:
+            os.chdir(original_directory)
+
+    print(f"🔨 {workers} sessions x {operations} adds on a {extension} store: "
+          f"{len(added)} added, {len(deleted)} deleted")
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ No duplicated IDs or lost transactions")
+
+
+if __name__ == "__main__":
+    main()